@@ -1,73 +1,112 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas import AIRequest
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import List
+from app.database import get_db
+from app.models import CrmAiScript, CrmCustomer
+from app.schemas import AIRequest, AIBatchRequest, AIScriptResponse
+from app.core.principal import Principal, get_current_principal, get_admin_principal
+from app.api.customer import build_customer_query
+from app.services.ai_client import ai_gateway, AIError
+from app.services.ai_batch import ai_batch_jobs, select_segment
 import json
-import requests
 
 router = APIRouter()
 
-# --- 硅基流动 DeepSeek 配置 ---
-# ⚠️ 核心问题：401 错误意味着这个 Key 必须更换！
-# 请登录 https://cloud.siliconflow.cn/ 注册并创建一个新的 API Key
-# 替换下方双引号中的内容
-SILICONFLOW_API_KEY = "sk-mfsovpqqaenrxqnqvbvgvhprblfvzqamiwjnfknonxtrftqf"
+def _http_error(e: AIError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail)
 
-# 使用更稳定的模型名称 (V2.5 也是免费/低价且稳定的)
-SILICONFLOW_MODEL = "deepseek-ai/DeepSeek-V2.5" 
-SILICONFLOW_URL = "https://api.siliconflow.cn/v1/chat/completions"
+def _check_provider():
+    # 服务商未就绪 (如未配置 Key) 时直接返回，不进入排队
+    try:
+        ai_gateway.check()
+    except AIError as e:
+        raise _http_error(e)
+
+def _sse(data: dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @router.post("/generate")
-def generate_ai_content(req: AIRequest):
-    # 基础检查
-    if not SILICONFLOW_API_KEY or "YOUR_KEY" in SILICONFLOW_API_KEY:
-        raise HTTPException(status_code=500, detail="AI Key 未配置，请在 backend/app/api/ai.py 中填入有效的 Key")
-        
+async def generate_ai_content(req: AIRequest):
+    _check_provider()
+    if req.stream:
+        return StreamingResponse(
+            _stream_events(req.prompt),
+            media_type="text/event-stream",
+            # 关闭 Nginx 缓冲，增量内容立即送达浏览器
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
     try:
-        # 构造请求体
-        payload = {
-            "model": SILICONFLOW_MODEL, 
-            "messages": [
-                {"role": "system", "content": "你是一个专业的家居行业金牌销售助手，擅长客户心理分析和话术生成。请直接输出话术内容，不要包含Markdown格式。"},
-                {"role": "user", "content": req.prompt}
-            ],
-            "stream": False,
-            "max_tokens": 512,
-            "temperature": 0.7
-        }
-        
-        headers = {
-            "Authorization": f"Bearer {SILICONFLOW_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        # 发送请求 (设置 30秒 超时)
-        response = requests.post(SILICONFLOW_URL, headers=headers, json=payload, timeout=30)
-        
-        # 详细的错误诊断
-        if response.status_code != 200:
-            error_body = response.text
-            print(f"AI API Error: {response.status_code} - {error_body}")
-            
-            if response.status_code == 401:
-                raise Exception("API Key 无效或已过期 (401)。请检查 backend/app/api/ai.py 中的 Key 是否正确。")
-            elif response.status_code == 402:
-                raise Exception("API Key 余额不足 (402)。请充值或更换 Key。")
-            elif response.status_code == 429:
-                raise Exception("请求过于频繁 (429)。请稍后再试。")
-            else:
-                raise Exception(f"服务商返回错误 ({response.status_code})")
-
-        result = response.json()
-        
-        if 'choices' not in result or len(result['choices']) == 0:
-            raise Exception("服务商返回了空结果")
-            
-        content = result['choices'][0]['message']['content']
+        content = await ai_gateway.generate(req.prompt)
         return {"result": content}
-            
-    except requests.exceptions.Timeout:
-        raise HTTPException(status_code=504, detail="AI 服务连接超时，请检查服务器网络")
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(status_code=502, detail="无法连接到 AI 服务商，请检查 DNS 或防火墙")
+    except AIError as e:
+        raise _http_error(e)
+    except Exception as e:
+        print(f"AI 模块异常: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_events(prompt: str):
+    """SSE 事件流: data: {"content": 增量} ... data: [DONE]；出错时发送 {"error": ...}"""
+    try:
+        async for delta in ai_gateway.stream(prompt):
+            yield _sse({"content": delta})
+    except AIError as e:
+        yield _sse({"error": e.detail, "status": e.status_code})
     except Exception as e:
         print(f"AI 模块异常: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        yield _sse({"error": str(e), "status": 500})
+    yield "data: [DONE]\n\n"
+
+# --- 批量话术: 为一批久未跟进的客户生成跟进话术 ---
+@router.post("/batch")
+async def create_ai_batch(
+    req: AIBatchRequest,
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    _check_provider()
+    if req.stale_days < 0:
+        raise HTTPException(status_code=400, detail="未跟进天数不能为负数")
+
+    def select():
+        # 与客户列表相同的数据权限
+        query = build_customer_query(db, principal, status=req.follow_status)
+        return select_segment(db, query, req.stale_days, req.include_never_followed, req.dept_id, req.limit)
+
+    items = await run_in_threadpool(select)
+    if not items:
+        raise HTTPException(status_code=400, detail="没有符合条件的客户")
+    job = ai_batch_jobs.submit(items, operator_id=principal.user.id)
+    return job.to_dict()
+
+@router.get("/batch/{job_id}")
+def get_ai_batch(job_id: str, principal: Principal = Depends(get_current_principal)):
+    job = ai_batch_jobs.get(job_id)
+    # 只有发起人 (和管理员) 能查看任务，其它账号按不存在处理
+    if not job or (job.operator_id != principal.user.id and not principal.policy.is_admin):
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job.to_dict()
+
+@router.get("/batch/{job_id}/results", response_model=List[AIScriptResponse])
+def get_ai_batch_results(
+    job_id: str,
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    # 只返回当前账号数据范围内的客户
+    query = db.query(CrmAiScript, CrmCustomer.customer_name).join(
+        CrmCustomer, CrmCustomer.id == CrmAiScript.customer_id
+    ).filter(CrmAiScript.job_id == job_id)
+    rows = principal.policy.apply_customer_scope(query).order_by(CrmAiScript.id).all()
+    result = []
+    for script, customer_name in rows:
+        res = AIScriptResponse.from_orm(script)
+        res.customer_name = customer_name
+        result.append(res)
+    return result
+
+# 网关状态: 并发、排队与缓存命中
+@router.get("/stats")
+def get_ai_stats(principal: Principal = Depends(get_admin_principal)):
+    return ai_gateway.stats()
@@ -1,11 +1,14 @@
 import request from '@/utils/request'
+import { useUserStore } from '@/store/user'
 
 /**
  * AI 内容生成请求体
  * @param prompt 用户的输入提示词
+ * @param stream 是否以 SSE 流式返回
  */
 interface AIRequest {
   prompt: string
+  stream?: boolean
 }
 
 /**
@@ -17,4 +20,83 @@ export const generateAI = (data: AIRequest) => request({
   url: '/ai/generate', 
   method: 'post', 
   data 
-})
\ No newline at end of file
+})
+
+/**
+ * 流式生成 (SSE)，每收到一段增量内容就回调 onDelta
+ * axios 在浏览器中无法逐段读取响应，这里使用 fetch
+ * @param prompt 提示词
+ * @param onDelta 增量内容回调
+ * @returns 完整的生成结果
+ */
+export const streamAI = async (prompt: string, onDelta: (delta: string) => void): Promise<string> => {
+  const userStore = useUserStore()
+  const response = await fetch('/api/ai/generate', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(userStore.token ? { Authorization: `Bearer ${userStore.token}` } : {})
+    },
+    body: JSON.stringify({ prompt, stream: true })
+  })
+  if (!response.ok || !response.body) {
+    const body = await response.json().catch(() => ({}))
+    throw new Error(body.detail || '请求失败')
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let result = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const events = buffer.split('\n\n')
+    buffer = events.pop() || ''
+    for (const event of events) {
+      const data = event.replace(/^data:\s*/, '')
+      if (data === '[DONE]') return result
+      const payload = JSON.parse(data)
+      if (payload.error) throw new Error(payload.error)
+      result += payload.content
+      onDelta(payload.content)
+    }
+  }
+  return result
+}
+
+/**
+ * 批量话术任务条件
+ * @param stale_days 超过多少天未跟进
+ * @param include_never_followed 是否包含从未跟进的客户
+ */
+interface AIBatchRequest {
+  stale_days?: number
+  include_never_followed?: boolean
+  dept_id?: number
+  follow_status?: string
+  limit?: number
+}
+
+/**
+ * 为久未跟进的客户批量生成跟进话术 (后台任务)
+ * @returns 任务信息 (job_id、客户数、去重后的提示词数)
+ */
+export const createAIBatch = (data: AIBatchRequest) => request({
+  url: '/ai/batch',
+  method: 'post',
+  data
+})
+
+/** 查询批量任务进度 */
+export const getAIBatch = (jobId: string) => request({
+  url: `/ai/batch/${jobId}`,
+  method: 'get'
+})
+
+/** 获取批量任务的生成结果 (每个客户一条) */
+export const getAIBatchResults = (jobId: string) => request({
+  url: `/ai/batch/${jobId}/results`,
+  method: 'get'
+})
@@ -0,0 +1,212 @@
+# backend/app/services/ai_batch.py
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_, insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal
+from app.models import CrmCustomer, CrmAiScript
+from app.core.name_resolver import NameResolver
+from app.services.ai_client import ai_gateway, AIError
+from app.services.ai_scheduler import PRIORITY_BULK
+
+# 配置: 单个任务同时调用 AI 的数量、单个任务最多客户数、结果落库批量、已结束任务的保留时间(秒)
+AI_BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", "4"))
+AI_BATCH_MAX_CUSTOMERS = int(os.getenv("AI_BATCH_MAX_CUSTOMERS", "2000"))
+AI_BATCH_SAVE_SIZE = int(os.getenv("AI_BATCH_SAVE_SIZE", "100"))
+AI_BATCH_JOB_RETENTION = int(os.getenv("AI_BATCH_JOB_RETENTION", "3600"))
+
+def build_customer_prompt(c, product_name: Optional[str] = None) -> str:
+    """根据客户资料生成跟进话术的提示词 (只使用画像字段，相同画像的客户得到相同提示词)"""
+    lines = ["请为以下家居客户写一段微信跟进话术，语气亲切、简洁，突出到店体验的理由，100 字以内。"]
+    fields = [
+        ("小区", c.community),
+        ("房屋面积", c.house_area),
+        ("装修进度", c.decoration_progress),
+        ("意向产品", product_name),
+        ("竞品", c.competitor),
+        ("当前跟进状态", c.follow_status),
+    ]
+    for label, value in fields:
+        if value:
+            lines.append(f"{label}: {value}")
+    if c.last_follow_time:
+        days = (datetime.now() - c.last_follow_time).days
+        # 按周取整，避免相差一天的客户生成不同的提示词
+        lines.append(f"距上次跟进: 约 {max(days // 7, 1)} 周")
+    else:
+        lines.append("距上次跟进: 尚未跟进")
+    return "\n".join(lines)
+
+def select_segment(
+    db: Session,
+    query,
+    stale_days: int,
+    include_never_followed: bool = True,
+    dept_id: Optional[int] = None,
+    limit: Optional[int] = None
+) -> List[Tuple[int, str]]:
+    """
+    选出需要跟进的客户并生成提示词
+    :param query: 已带数据权限的客户查询 (build_customer_query)
+    :return: [(客户ID, 提示词)]，最久未跟进的在前
+    """
+    cutoff = datetime.now() - timedelta(days=stale_days)
+    stale = CrmCustomer.last_follow_time < cutoff
+    if include_never_followed:
+        stale = or_(stale, CrmCustomer.last_follow_time.is_(None))
+    query = query.filter(stale, or_(CrmCustomer.is_deal == 0, CrmCustomer.is_deal.is_(None)))
+    if dept_id:
+        query = query.filter(CrmCustomer.dept_id == dept_id)
+    limit = min(limit or AI_BATCH_MAX_CUSTOMERS, AI_BATCH_MAX_CUSTOMERS)
+    rows = query.with_entities(
+        CrmCustomer.id, CrmCustomer.community, CrmCustomer.house_area, CrmCustomer.decoration_progress,
+        CrmCustomer.competitor, CrmCustomer.follow_status, CrmCustomer.intent_product_id, CrmCustomer.last_follow_time
+    ).order_by(CrmCustomer.last_follow_time.is_(None).desc(), CrmCustomer.last_follow_time.asc()).limit(limit).all()
+
+    resolver = NameResolver(db).prefetch(product=[r.intent_product_id for r in rows])
+    return [(r.id, build_customer_prompt(r, resolver.name("product", r.intent_product_id))) for r in rows]
+
+class AIBatchJob:
+    """一次批量话术生成任务的状态"""
+    def __init__(self, items: List[Tuple[int, str]], operator_id: Optional[int]):
+        self.id = uuid.uuid4().hex
+        self.operator_id = operator_id
+        # 相同提示词只生成一次: 提示词 -> 客户ID列表
+        self.groups: Dict[str, List[int]] = {}
+        for customer_id, prompt in items:
+            self.groups.setdefault(prompt, []).append(customer_id)
+        self.total = len(items)
+        self.status = "pending"  # pending / running / success / failed
+        self.error: Optional[str] = None
+        self.done = 0
+        self.failed = 0
+        self.prompts_done = 0
+        self.create_time = datetime.now()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "unique_prompts": len(self.groups),
+            "prompts_done": self.prompts_done,
+            "success": self.done,
+            "failed": self.failed,
+            "create_time": self.create_time,
+        }
+
+class AIBatchManager:
+    """
+    批量话术任务管理
+    任务在事件循环中以 asyncio.Task 运行，每个任务最多 AI_BATCH_CONCURRENCY 个并发请求，
+    以批量优先级进入 AI 调度器，不会挤占交互请求；结果分批写入 crm_ai_script。
+    """
+    def __init__(self):
+        self._jobs: Dict[str, AIBatchJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def submit(self, items: List[Tuple[int, str]], operator_id: Optional[int] = None) -> AIBatchJob:
+        """须在事件循环中调用 (async 接口)"""
+        self._prune()
+        job = AIBatchJob(items, operator_id)
+        self._jobs[job.id] = job
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    def get(self, job_id: str) -> Optional[AIBatchJob]:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: AIBatchJob) -> None:
+        job.status = "running"
+        pending: List[dict] = []
+        queue = iter(job.groups.items())
+
+        async def worker():
+            for prompt, customer_ids in queue:
+                content, error = None, None
+                try:
+                    content = await ai_gateway.generate(prompt, priority=PRIORITY_BULK)
+                except AIError as e:
+                    error = e.detail
+                except Exception as e:
+                    # 单个提示词的意外错误记为失败行，不中断其它 worker
+                    error = f"{type(e).__name__}: {e}"
+                prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+                for customer_id in customer_ids:
+                    pending.append({
+                        "customer_id": customer_id,
+                        "job_id": job.id,
+                        "prompt_hash": prompt_hash,
+                        "content": content,
+                        "status": "failed" if error else "success",
+                        "error": error[:255] if error else None,
+                        "create_user_id": job.operator_id,
+                    })
+                job.prompts_done += 1
+                if error:
+                    job.failed += len(customer_ids)
+                else:
+                    job.done += len(customer_ids)
+                if len(pending) >= AI_BATCH_SAVE_SIZE:
+                    rows = pending[:]
+                    pending.clear()
+                    await run_in_threadpool(self._save, rows)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(AI_BATCH_CONCURRENCY)]
+        try:
+            await asyncio.gather(*workers)
+            job.status = "success"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "任务已取消"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            # 一个 worker 出错 (如结果落库失败) 时停止其它 worker
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            # 已生成的结果在任务失败 / 取消时也落库
+            try:
+                if pending:
+                    await asyncio.shield(run_in_threadpool(self._save, pending))
+            except Exception as e:
+                job.status = "failed"
+                job.error = job.error or f"结果保存失败: {e}"
+            job.finished_at = time.monotonic()
+
+    @staticmethod
+    def _save(rows: List[dict]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(CrmAiScript), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for job_id in [
+            k for k, j in self._jobs.items()
+            if j.finished_at and now - j.finished_at > AI_BATCH_JOB_RETENTION
+        ]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+# 全局单例
+ai_batch_jobs = AIBatchManager()
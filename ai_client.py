@@ -0,0 +1,312 @@
+# backend/app/services/ai_client.py
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional
+import httpx
+from app.services.ai_scheduler import (
+    AIScheduler, PRIORITY_INTERACTIVE, AI_MAX_RETRIES, backoff_delay, is_retryable
+)
+
+# --- 硅基流动 DeepSeek 配置 ---
+# Key 只从环境变量读取，不写进代码；请登录 https://cloud.siliconflow.cn/ 创建 API Key
+SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY", "")
+# 使用更稳定的模型名称 (V2.5 也是免费/低价且稳定的)
+SILICONFLOW_MODEL = os.getenv("SILICONFLOW_MODEL", "deepseek-ai/DeepSeek-V2.5")
+SILICONFLOW_URL = os.getenv("SILICONFLOW_URL", "https://api.siliconflow.cn/v1/chat/completions")
+
+# 服务商: siliconflow / mock (本地测试用)
+AI_PROVIDER = os.getenv("AI_PROVIDER", "siliconflow")
+# 同时请求服务商的最大并发数、交互请求排队最长等待时间(秒)、单次请求超时(秒)
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_QUEUE_TIMEOUT = float(os.getenv("AI_QUEUE_TIMEOUT", "20"))
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "30"))
+# 单次生成的最大输出 token 数
+AI_MAX_TOKENS = int(os.getenv("AI_MAX_TOKENS", "512"))
+# 结果缓存: 有效期(秒) 与最大条目数
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "600"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1000"))
+
+SYSTEM_PROMPT = "你是一个专业的家居行业金牌销售助手，擅长客户心理分析和话术生成。请直接输出话术内容，不要包含Markdown格式。"
+
+class AIError(Exception):
+    """AI 调用异常，status_code 为返回给前端的 HTTP 状态码"""
+    def __init__(self, status_code: int, detail: str, upstream_status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.upstream_status = upstream_status
+        self.retry_after = retry_after
+
+def build_messages(prompt: str) -> List[dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+# --- 服务商 ---
+class SiliconFlowProvider:
+    """硅基流动 (OpenAI 兼容接口)，共用一个 httpx 连接池"""
+    name = "siliconflow"
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def check(self) -> None:
+        """配置检查，未配置 Key 时抛出 AIError"""
+        if not SILICONFLOW_API_KEY:
+            raise AIError(500, "AI Key 未配置，请设置环境变量 SILICONFLOW_API_KEY")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        self.check()
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(AI_REQUEST_TIMEOUT, connect=5),
+                limits=httpx.Limits(max_connections=AI_MAX_CONCURRENCY, max_keepalive_connections=AI_MAX_CONCURRENCY),
+                headers={"Authorization": f"Bearer {SILICONFLOW_API_KEY}"}
+            )
+        return self._client
+
+    def _payload(self, messages: List[dict], stream: bool) -> dict:
+        return {
+            "model": SILICONFLOW_MODEL,
+            "messages": messages,
+            "stream": stream,
+            "max_tokens": AI_MAX_TOKENS,
+            "temperature": 0.7
+        }
+
+    @staticmethod
+    def _raise_for_status(resp: httpx.Response, body: str) -> None:
+        status_code = resp.status_code
+        if status_code == 200:
+            return
+        print(f"AI API Error: {status_code} - {body}")
+        if status_code == 401:
+            raise AIError(500, "API Key 无效或已过期 (401)。请检查 SILICONFLOW_API_KEY 配置。", status_code)
+        if status_code == 402:
+            raise AIError(500, "API Key 余额不足 (402)。请充值或更换 Key。", status_code)
+        if status_code == 429:
+            try:
+                retry_after = float(resp.headers.get("Retry-After", ""))
+            except ValueError:
+                retry_after = None
+            raise AIError(429, "请求过于频繁 (429)。请稍后再试。", status_code, retry_after)
+        raise AIError(502, f"服务商返回错误 ({status_code})", status_code)
+
+    async def complete(self, messages: List[dict]) -> str:
+        try:
+            resp = await self._get_client().post(SILICONFLOW_URL, json=self._payload(messages, False))
+        except httpx.TimeoutException:
+            raise AIError(504, "AI 服务连接超时，请检查服务器网络")
+        except httpx.TransportError:
+            raise AIError(502, "无法连接到 AI 服务商，请检查 DNS 或防火墙")
+        self._raise_for_status(resp, resp.text)
+        result = resp.json()
+        if not result.get('choices'):
+            raise AIError(502, "服务商返回了空结果", resp.status_code)
+        return result['choices'][0]['message']['content']
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        try:
+            async with self._get_client().stream("POST", SILICONFLOW_URL, json=self._payload(messages, True)) as resp:
+                if resp.status_code != 200:
+                    self._raise_for_status(resp, (await resp.aread()).decode(errors="ignore"))
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError):
+                        continue
+                    if delta:
+                        yield delta
+        except httpx.TimeoutException:
+            raise AIError(504, "AI 服务连接超时，请检查服务器网络")
+        except httpx.TransportError:
+            raise AIError(502, "无法连接到 AI 服务商，请检查 DNS 或防火墙")
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class MockProvider:
+    """本地模拟服务商: 不发外部请求，按固定延迟返回可预期的内容"""
+    name = "mock"
+
+    def __init__(self, latency: float = float(os.getenv("AI_MOCK_LATENCY", "0.2"))):
+        self.latency = latency
+
+    def check(self) -> None:
+        pass
+
+    def _reply(self, messages: List[dict]) -> str:
+        prompt = messages[-1]["content"]
+        return f"【模拟话术】您好，关于「{prompt[:50]}」，我们为您准备了专属方案，欢迎到店体验。"
+
+    async def complete(self, messages: List[dict]) -> str:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+    async def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        text = self._reply(messages)
+        step = max(1, len(text) // 8)
+        for i in range(0, len(text), step):
+            await asyncio.sleep(self.latency / 8)
+            yield text[i:i + step]
+
+    async def close(self) -> None:
+        pass
+
+PROVIDERS = {"siliconflow": SiliconFlowProvider, "mock": MockProvider}
+
+# --- 结果缓存 ---
+class PromptCache:
+    """按规范化后的提示词缓存生成结果 (LRU + TTL)；只合并空白差异，大小写不同的提示词分别缓存"""
+    def __init__(self, ttl: int = AI_CACHE_TTL, max_entries: int = AI_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(provider: str, prompt: str) -> str:
+        normalized = re.sub(r"\s+", " ", prompt).strip()
+        return hashlib.sha256(f"{provider}|{SILICONFLOW_MODEL}|{normalized}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, content: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+# --- 网关 ---
+class AIGateway:
+    """
+    AI 调用网关
+    - 连接池复用 TCP/TLS 连接
+    - 请求经 AIScheduler 排队 (并发上限、RPM/TPM 令牌桶、优先级)；交互请求排队超时返回 503
+    - 429 / 5xx 按指数退避 + 抖动重试
+    - 相同提示词命中缓存时直接返回
+    """
+    def __init__(self, provider_name: str = AI_PROVIDER):
+        self.provider = PROVIDERS[provider_name]()
+        self.cache = PromptCache()
+        self.scheduler = AIScheduler(AI_MAX_CONCURRENCY)
+
+    def check(self) -> None:
+        """服务商配置检查 (如未配置 Key)，失败时抛出 AIError，调用方可在排队前提前返回"""
+        self.provider.check()
+
+    @staticmethod
+    def _estimate_tokens(prompt: str) -> int:
+        # 中文约 1 字 1 token，再加上最大输出长度
+        return len(SYSTEM_PROMPT) + len(prompt) + AI_MAX_TOKENS
+
+    async def _acquire(self, priority: int, tokens: int) -> None:
+        # 批量任务只排队不超时，交互请求超过 AI_QUEUE_TIMEOUT 直接返回繁忙
+        timeout = AI_QUEUE_TIMEOUT if priority == PRIORITY_INTERACTIVE else None
+        try:
+            await self.scheduler.acquire(priority, tokens, timeout)
+        except asyncio.TimeoutError:
+            self.scheduler.counters["queue_timeouts"] += 1
+            raise AIError(503, "AI 服务繁忙，请稍后再试")
+
+    def _on_error(self, e: AIError, attempt: int) -> float:
+        """记录失败并返回重试前的等待秒数；不可重试时重新抛出"""
+        if e.upstream_status == 429:
+            self.scheduler.pause(e.retry_after or backoff_delay(attempt))
+        if attempt >= AI_MAX_RETRIES or not is_retryable(e.upstream_status, e.status_code):
+            self.scheduler.counters["failed"] += 1
+            raise e
+        self.scheduler.counters["retries"] += 1
+        return backoff_delay(attempt, e.retry_after)
+
+    async def generate(self, prompt: str, priority: int = PRIORITY_INTERACTIVE, use_cache: bool = True) -> str:
+        key = PromptCache.key(self.provider.name, prompt)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        tokens = self._estimate_tokens(prompt)
+        self.scheduler.counters["requests"] += 1
+        for attempt in range(AI_MAX_RETRIES + 1):
+            await self._acquire(priority, tokens)
+            started = time.monotonic()
+            try:
+                content = await self.provider.complete(build_messages(prompt))
+                self.scheduler.latency.add(time.monotonic() - started)
+                break
+            except AIError as e:
+                delay = self._on_error(e, attempt)
+            finally:
+                self.scheduler.release()
+            await asyncio.sleep(delay)
+        self.cache.put(key, content)
+        return content
+
+    async def stream(self, prompt: str, priority: int = PRIORITY_INTERACTIVE, use_cache: bool = True) -> AsyncIterator[str]:
+        key = PromptCache.key(self.provider.name, prompt)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        tokens = self._estimate_tokens(prompt)
+        self.scheduler.counters["requests"] += 1
+        parts: List[str] = []
+        for attempt in range(AI_MAX_RETRIES + 1):
+            await self._acquire(priority, tokens)
+            started = time.monotonic()
+            try:
+                async for delta in self.provider.stream(build_messages(prompt)):
+                    parts.append(delta)
+                    yield delta
+                self.scheduler.latency.add(time.monotonic() - started)
+                break
+            except AIError as e:
+                # 已经向前端输出过内容的流无法重试
+                if parts:
+                    self.scheduler.counters["failed"] += 1
+                    raise
+                delay = self._on_error(e, attempt)
+            finally:
+                self.scheduler.release()
+            await asyncio.sleep(delay)
+        self.cache.put(key, "".join(parts))
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "scheduler": self.scheduler.stats(),
+            "cache_entries": len(self.cache._entries),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses
+        }
+
+    async def close(self) -> None:
+        await self.provider.close()
+
+# 全局单例
+ai_gateway = AIGateway()
@@ -0,0 +1,197 @@
+# backend/app/services/ai_scheduler.py
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+# 服务商限额: 每分钟请求数 / 每分钟 token 数
+AI_RPM_LIMIT = int(os.getenv("AI_RPM_LIMIT", "60"))
+AI_TPM_LIMIT = int(os.getenv("AI_TPM_LIMIT", "60000"))
+# 429 / 5xx 重试: 最大次数、退避基数与上限(秒)
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "0.5"))
+AI_BACKOFF_MAX = float(os.getenv("AI_BACKOFF_MAX", "10"))
+# 延迟统计保留的样本数
+AI_LATENCY_WINDOW = int(os.getenv("AI_LATENCY_WINDOW", "1000"))
+
+# 优先级: 数值越小越先调度
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+class TokenBucket:
+    """令牌桶: 容量为每分钟限额，按秒匀速补充"""
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """距离可取出 amount 个令牌还需等待的秒数 (0 表示现在即可)"""
+        self._refill()
+        # 单次请求超过桶容量时按满桶处理，避免永远等不到
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self) -> None:
+        """服务商返回 429 时清空令牌，让后续请求自然放缓"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+class LatencyWindow:
+    """最近 N 次耗时的滑动窗口，用于计算分位数"""
+    def __init__(self, size: int = AI_LATENCY_WINDOW):
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentiles(self) -> dict:
+        data = sorted(self._samples)
+        if not data:
+            return {"count": 0, "p50": None, "p90": None, "p99": None}
+        pick = lambda q: round(data[min(len(data) - 1, int(q * len(data)))] * 1000, 1)
+        return {"count": len(data), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99)}
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "future", "enqueued_at")
+
+    def __init__(self, priority: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class AIScheduler:
+    """
+    AI 请求调度器
+    - 并发上限 + RPM/TPM 两个令牌桶，均满足时才放行
+    - 排队按优先级 (同优先级先进先出)，交互请求优先于批量任务
+    - 服务商返回 429 时暂停放行 retry_after 秒
+    所有方法都在同一个事件循环中调用，不需要加锁。
+    """
+    def __init__(self, max_concurrency: int, rpm: int = AI_RPM_LIMIT, tpm: int = AI_TPM_LIMIT):
+        self.max_concurrency = max_concurrency
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.running = 0
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self.queue_wait = LatencyWindow()
+        self.latency = LatencyWindow()
+        self.counters: Dict[str, int] = {"requests": 0, "retries": 0, "rate_limited": 0, "failed": 0, "queue_timeouts": 0}
+
+    # --- 调度 ---
+    def _dispatch(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        while self._heap and self.running < self.max_concurrency:
+            waiter: _Waiter = self._heap[0][2]
+            if waiter.future.done():
+                # 已超时 / 取消的排队者
+                heapq.heappop(self._heap)
+                continue
+            delay = max(
+                self._paused_until - time.monotonic(),
+                self.rpm.wait_time(1),
+                self.tpm.wait_time(waiter.tokens)
+            )
+            if delay > 0:
+                # 令牌不足时不越过队首 (否则低优先级的小请求会饿死大请求)，到时再试
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._heap)
+            self.rpm.take(1)
+            self.tpm.take(waiter.tokens)
+            self.running += 1
+            waiter.future.set_result(None)
+
+    async def acquire(self, priority: int, tokens: int, timeout: Optional[float] = None) -> None:
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, tokens, future)
+        heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if future.done() and not future.cancelled():
+                # 超时的同时刚好被放行，归还名额
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self.queue_wait.add(time.monotonic() - waiter.enqueued_at)
+
+    def release(self) -> None:
+        self.running -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: int, tokens: int, timeout: Optional[float] = None):
+        await self.acquire(priority, tokens, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def pause(self, seconds: float) -> None:
+        """服务商限流: 在 seconds 秒内不再放行新请求"""
+        self.counters["rate_limited"] += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.rpm.drain()
+
+    # --- 指标 ---
+    def queue_depth(self) -> Dict[str, int]:
+        depth: Dict[str, int] = {}
+        for priority, _, waiter in self._heap:
+            if not waiter.future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+        return depth
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "queue_depth": self.queue_depth(),
+            "paused_for": round(max(self._paused_until - time.monotonic(), 0), 1),
+            "rpm_available": round(self.rpm.tokens, 1),
+            "tpm_available": round(self.tpm.tokens, 1),
+            "queue_wait_ms": self.queue_wait.percentiles(),
+            "latency_ms": self.latency.percentiles(),
+            **self.counters
+        }
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """指数退避 + 全抖动；服务商给出 Retry-After 时以其为下限"""
+    delay = random.uniform(0, min(AI_BACKOFF_MAX, AI_BACKOFF_BASE * (2 ** attempt)))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+def is_retryable(upstream_status: Optional[int], status_code: int) -> bool:
+    """429 / 5xx 以及连接超时、连接失败可以重试"""
+    if upstream_status is not None:
+        return upstream_status == 429 or upstream_status >= 500
+    return status_code in (502, 504)
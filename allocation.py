@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
-from app.models import SysRegionAllocation, SysDept, SysUser
+from app.services.import_jobs import import_jobs
+from app.models import SysRegionAllocation
+from app.core.name_resolver import NameResolver
+from app.services.region_matcher import invalidate_region_matcher
 from app.schemas import AllocationCreate, AllocationUpdate, AllocationResponse
 
 router = APIRouter()
@@ -25,16 +28,16 @@ def get_allocations(
         
     items = query.order_by(SysRegionAllocation.create_time.desc()).all()
     
-    # 填充名称
+    # 填充名称 (批量解析)
+    resolver = NameResolver(db).prefetch(
+        dept=[i.target_dept_id for i in items],
+        user=[i.target_leader_id for i in items]
+    )
     result = []
     for item in items:
         res = AllocationResponse.from_orm(item)
-        if item.target_dept_id:
-            dept = db.query(SysDept).filter(SysDept.id == item.target_dept_id).first()
-            if dept: res.dept_name = dept.dept_name
-        if item.target_leader_id:
-            user = db.query(SysUser).filter(SysUser.id == item.target_leader_id).first()
-            if user: res.leader_name = user.username
+        res.dept_name = resolver.name("dept", item.target_dept_id)
+        res.leader_name = resolver.name("user", item.target_leader_id)
         result.append(res)
     return result
 
@@ -44,6 +47,7 @@ def create_allocation(item: AllocationCreate, db: Session = Depends(get_db)):
     db_item = SysRegionAllocation(**item.dict())
     db.add(db_item)
     db.commit()
+    invalidate_region_matcher()
     db.refresh(db_item)
     return db_item
 
@@ -57,6 +61,7 @@ def update_allocation(id: int, item: AllocationUpdate, db: Session = Depends(get
         setattr(db_item, field, value)
         
     db.commit()
+    invalidate_region_matcher()
     db.refresh(db_item)
     return db_item
 
@@ -67,4 +72,11 @@ def delete_allocation(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="规则不存在")
     db.delete(db_item)
     db.commit()
-    return {"msg": "删除成功"}
\ No newline at end of file
+    invalidate_region_matcher()
+    return {"msg": "删除成功"}
+
+# --- 导入分配规则 (后台任务，返回任务 ID 供轮询进度) ---
+@router.post("/import")
+def import_allocations(file: UploadFile = File(...)):
+    job = import_jobs.submit("allocation", file)
+    return {"job_id": job.id, "status": job.status}
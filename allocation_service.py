@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from app.models import SysRegionAllocation
+from app.services.region_matcher import get_region_matcher
 from typing import Tuple, Optional
 
 class AllocationService:
@@ -15,31 +15,6 @@ class AllocationService:
         if not address:
             return None, None
             
-        # 获取所有启用的分配规则 (按创建时间倒序，优先匹配最新的规则)
-        rules = self.db.query(SysRegionAllocation).order_by(SysRegionAllocation.create_time.desc()).all()
-        
-        for rule in rules:
-            # 1. 匹配天淘系地址 (省+市)
-            if rule.tiantao_province and rule.tiantao_province in address:
-                # 如果规则定义了市，则必须同时匹配市
-                if rule.tiantao_city:
-                    if rule.tiantao_city in address:
-                        return rule.target_dept_id, rule.target_leader_id
-                else:
-                    # 如果规则只定义了省，则匹配省即可
-                    return rule.target_dept_id, rule.target_leader_id
-            
-            # 2. 匹配抖音系地址 (省+市 或 组合字段)
-            if rule.douyin_province and rule.douyin_province in address:
-                if rule.douyin_city:
-                    if rule.douyin_city in address:
-                        return rule.target_dept_id, rule.target_leader_id
-                else:
-                    return rule.target_dept_id, rule.target_leader_id
-            
-            # 3. 匹配抖音聚合字段 (如 "广东省广州市")
-            if rule.douyin_province_city and rule.douyin_province_city in address:
-                return rule.target_dept_id, rule.target_leader_id
-
-        # 如果没有匹配到任何规则，返回空
-        return None, None
\ No newline at end of file
+        # 使用编译后的规则索引 (Aho-Corasick)，一次扫描地址即可完成匹配
+        # 优先级与原逐条匹配一致: 按创建时间倒序，优先匹配最新的规则
+        return get_region_matcher(self.db).match(address)
@@ -1,63 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from typing import List, Optional
-from app.database import get_db
-from app.models import CrmCustomer, SysUser, SysDept, SysRole, CrmProduct, SysOperationLog, CrmFollowRecord
-from app.schemas import CustomerCreate, CustomerUpdate, CustomerResponse, LogResponse, FollowCreate, FollowResponse, CustomerTransfer
-from jose import jwt, JWTError
-from app.core.security import SECRET_KEY, ALGORITHM
-from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import or_, and_, case, select
+from sqlalchemy.dialects.mysql import match as mysql_match
+from typing import List, Optional, Tuple
+from datetime import datetime
+import base64
+import re
+import hashlib
+from app.database import get_db, SessionLocal
+from app.models import CrmCustomer, SysUser, SysDept, CrmProduct, SysOperationLog, CrmFollowRecord, CrmOrder, CrmAiScript
+from app.schemas import CustomerCreate, CustomerUpdate, CustomerResponse, LogResponse, FollowCreate, FollowResponse, CustomerTransfer, CustomerPage, CustomerDetail, OrderResponse, AIScriptResponse
+from app.core.principal import Principal, get_current_principal, get_current_user
+from app.core.name_resolver import NameResolver
+from app.core.ref_cache import ref_cache
+from app.core.oplog import add_log
+from app.services.import_jobs import import_jobs
+from app.services.stats_service import bump_daily_stat, move_customer_stats, UNCHANGED
+from app.services.export_service import CustomerExporter
+from app.api.order import fill_image_variants
 
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-# --- 辅助函数: 获取当前登录用户 ---
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=401, detail="无效凭证")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="无效凭证")
-    
-    user = db.query(SysUser).filter(SysUser.username == username).first()
-    if user is None:
-        raise HTTPException(status_code=401, detail="用户不存在")
-    return user
-
-# --- 辅助函数: 记录操作日志 ---
-def add_log(db: Session, ref_id: int, operator: str, action: str, content: str):
-    log = SysOperationLog(
-        ref_id=ref_id,
-        operator_name=operator,
-        action_type=action,
-        content=content
-    )
-    db.add(log)
-    db.commit()
+# 分页参数: 默认每页条数与上限
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+# 批量转移每批客户数 (IN 列表长度)
+TRANSFER_BATCH_SIZE = 1000
+# 客户详情中跟进、订单、日志各返回的最近条数
+DETAIL_CHILD_LIMIT = 20
+# 导出格式 -> Content-Type
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
 
-# --- 1. 获取客户列表 (带权限控制) ---
-@router.get("/", response_model=List[CustomerResponse])
-def get_customers(
+# --- 辅助函数: 构建带权限与筛选条件的客户查询 ---
+def build_customer_query(
+    db: Session,
+    principal: Principal,
     name: Optional[str] = None,
     phone: Optional[str] = None,
-    status: Optional[str] = None,
-    current_user: SysUser = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    status: Optional[str] = None
 ):
-    query = db.query(CrmCustomer)
-    
-    # 权限逻辑
-    user_role = db.query(SysRole).filter(SysRole.id == current_user.role_id).first()
-    is_admin = user_role and ('管理员' in user_role.role_name or 'admin' in user_role.role_code.lower())
-    
-    if not is_admin:
-        if current_user.dept_id:
-            query = query.filter(CrmCustomer.dept_id == current_user.dept_id)
-            if current_user.post == '导购':
-                query = query.filter(CrmCustomer.owner_id == current_user.id)
+    # 权限逻辑: 登录态中已编译好的数据范围，不再查询角色
+    query = principal.policy.apply_customer_scope(db.query(CrmCustomer))
     
     # 筛选条件
     if name:
@@ -66,26 +54,237 @@ def get_customers(
         query = query.filter(CrmCustomer.phone.like(f"%{phone}%"))
     if status:
         query = query.filter(CrmCustomer.follow_status == status)
-        
-    customers = query.order_by(CrmCustomer.create_time.desc()).all()
-    
-    # 填充关联显示的名称
+    return query
+
+# --- 辅助函数: 填充关联显示的名称 ---
+def to_customer_responses(db: Session, customers: List[CrmCustomer]) -> List[CustomerResponse]:
+    # 每种名称只查一次 (IN 批量查询)
+    resolver = NameResolver(db).prefetch(
+        dept=[c.dept_id for c in customers],
+        user=[c.owner_id for c in customers],
+        product=[c.intent_product_id for c in customers]
+    )
     result = []
     for c in customers:
         res = CustomerResponse.from_orm(c)
-        if c.dept_id:
-            d = db.query(SysDept).filter(SysDept.id == c.dept_id).first()
-            if d: res.dept_name = d.dept_name
-        if c.owner_id:
-            u = db.query(SysUser).filter(SysUser.id == c.owner_id).first()
-            if u: res.owner_name = u.username
-        if c.intent_product_id:
-            p = db.query(CrmProduct).filter(CrmProduct.id == c.intent_product_id).first()
-            if p: res.intent_product_name = p.product_name
+        res.dept_name = resolver.name("dept", c.dept_id)
+        res.owner_name = resolver.name("user", c.owner_id)
+        res.intent_product_name = resolver.name("product", c.intent_product_id)
         result.append(res)
-        
     return result
 
+# --- 辅助函数: 游标编解码 (create_time, id) ---
+def encode_cursor(create_time: Optional[datetime], id: int) -> str:
+    raw = f"{create_time.isoformat() if create_time else ''}|{id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        time_str, id_str = raw.split("|", 1)
+        return (datetime.fromisoformat(time_str) if time_str else None), int(id_str)
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+# --- 1. 获取客户列表 (带权限控制) ---
+@router.get("/", response_model=List[CustomerResponse])
+def get_customers(
+    name: Optional[str] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None,
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    query = build_customer_query(db, principal, name, phone, status)
+    customers = query.order_by(CrmCustomer.create_time.desc(), CrmCustomer.id.desc()).all()
+    return to_customer_responses(db, customers)
+
+# --- 1.1 分页获取客户列表 (游标分页，按 create_time, id 倒序) ---
+@router.get("/page", response_model=CustomerPage)
+def get_customer_page(
+    name: Optional[str] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1),
+    with_total: bool = False,
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    limit = min(limit, PAGE_SIZE_MAX)
+    query = build_customer_query(db, principal, name, phone, status)
+    
+    # 总数只在需要时统计 (COUNT 会扫描全部可见行)
+    total = query.order_by(None).count() if with_total else None
+    
+    if cursor:
+        last_time, last_id = decode_cursor(cursor)
+        if last_time is None:
+            # create_time 为空的行排在最后，只需继续比较 id
+            query = query.filter(CrmCustomer.create_time.is_(None), CrmCustomer.id < last_id)
+        else:
+            query = query.filter(or_(
+                CrmCustomer.create_time < last_time,
+                and_(CrmCustomer.create_time == last_time, CrmCustomer.id < last_id),
+                CrmCustomer.create_time.is_(None)
+            ))
+    
+    # 多取一行用于判断是否还有下一页
+    rows = query.order_by(CrmCustomer.create_time.desc(), CrmCustomer.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1].create_time, rows[-1].id)
+    
+    return {
+        "items": to_customer_responses(db, rows),
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "total": total
+    }
+
+# --- 辅助函数: 搜索关键字清洗 ---
+def escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def fulltext_phrase(term: str) -> str:
+    # 去掉 BOOLEAN MODE 的运算符，按短语匹配 (ngram 要求连续命中)
+    cleaned = re.sub(r'[+\-<>()~*"@]', ' ', term).strip()
+    return f'"{cleaned}"' if cleaned else ""
+
+# --- 1.2 客户搜索 (姓名前缀 / 手机尾号 / 姓名小区地址全文检索，按相关度排序) ---
+@router.get("/search", response_model=CustomerPage)
+def search_customers(
+    q: str = Query(..., min_length=1, max_length=50),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1),
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    limit = min(limit, PAGE_SIZE_MAX)
+    offset = int(cursor) if cursor and cursor.isdigit() else 0
+    term = q.strip()
+    query = build_customer_query(db, principal)
+    
+    if term.isdigit():
+        # 手机号: 前缀走唯一索引，尾号走倒序生成列索引
+        like_term = escape_like(term)
+        query = query.filter(or_(
+            CrmCustomer.phone.like(f"{like_term}%", escape="\\"),
+            CrmCustomer.phone_rev.like(f"{escape_like(term[::-1])}%", escape="\\")
+        ))
+        score = case((CrmCustomer.phone == term, 2), else_=1)
+    else:
+        # 姓名前缀 + ngram 全文检索 (姓名、小区、地址)
+        prefix = CrmCustomer.customer_name.like(f"{escape_like(term)}%", escape="\\")
+        phrase = fulltext_phrase(term)
+        if phrase and len(term) >= 2:
+            match = mysql_match(
+                CrmCustomer.customer_name, CrmCustomer.community, CrmCustomer.address, against=phrase
+            ).in_boolean_mode()
+            query = query.filter(or_(prefix, match))
+            score = case((prefix, 100), else_=0) + match
+        else:
+            query = query.filter(prefix)
+            score = case((CrmCustomer.customer_name == term, 2), else_=1)
+    
+    rows = query.order_by(score.desc(), CrmCustomer.id.desc()).offset(offset).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": to_customer_responses(db, rows),
+        "next_cursor": str(offset + limit) if has_more else None,
+        "has_more": has_more,
+        "total": None
+    }
+
+# --- 1.3 导出客户 (与列表相同的筛选与数据权限，边查边写，流式下发) ---
+@router.get("/export")
+def export_customers(
+    name: Optional[str] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|xlsx)$"),
+    principal: Principal = Depends(get_current_principal)
+):
+    def generate():
+        # 响应发送期间使用独立的 Session，与请求依赖的生命周期无关
+        stream_db, name_db = SessionLocal(), SessionLocal()
+        try:
+            exporter = CustomerExporter(stream_db, name_db, build_customer_query(stream_db, principal, name, phone, status))
+            yield from (exporter.iter_xlsx() if fmt == "xlsx" else exporter.iter_csv())
+        finally:
+            stream_db.close()
+            name_db.close()
+
+    filename = f"customers_{datetime.now():%Y%m%d%H%M%S}.{fmt}"
+    return StreamingResponse(generate(), media_type=EXPORT_MEDIA_TYPES[fmt], headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        # 关闭 Nginx 缓冲，数据边生成边下发
+        "X-Accel-Buffering": "no"
+    })
+
+# --- 1.4 客户详情 (固定查询次数，支持 ETag 协商缓存) ---
+@router.get("/{id}", response_model=CustomerDetail)
+def get_customer_detail(
+    id: int,
+    request: Request,
+    response: Response,
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    # 1. 客户本身 + 子数据的版本标记 (一条查询，带权限过滤)
+    follow_mark = select(func.max(CrmFollowRecord.id)).where(CrmFollowRecord.customer_id == id).scalar_subquery()
+    order_mark = select(func.concat(func.count(CrmOrder.id), ':', func.coalesce(func.max(CrmOrder.id), 0))) \
+        .where(CrmOrder.customer_id == id).scalar_subquery()
+    log_mark = select(func.max(SysOperationLog.id)).where(SysOperationLog.ref_id == id).scalar_subquery()
+    row = build_customer_query(db, principal) \
+        .add_columns(follow_mark, order_mark, log_mark) \
+        .filter(CrmCustomer.id == id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="客户不存在")
+    customer, follow_max, order_info, log_max = row
+    
+    # 2. ETag: 客户字段 + 子数据标记 + 基础资料版本 (名称变化也要失效)
+    fingerprint = repr((
+        CustomerResponse.from_orm(customer).dict(), follow_max, order_info, log_max,
+        ref_cache.version(SysDept), ref_cache.version(SysUser), ref_cache.version(CrmProduct)
+    ))
+    etag = '"' + hashlib.sha1(fingerprint.encode()).hexdigest() + '"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+    
+    # 3. 最近的跟进、订单、日志 (各一条查询)
+    follows = db.query(CrmFollowRecord).filter(CrmFollowRecord.customer_id == id) \
+        .order_by(CrmFollowRecord.create_time.desc(), CrmFollowRecord.id.desc()).limit(DETAIL_CHILD_LIMIT).all()
+    orders = db.query(CrmOrder).filter(CrmOrder.customer_id == id) \
+        .order_by(CrmOrder.create_time.desc(), CrmOrder.id.desc()).limit(DETAIL_CHILD_LIMIT).all()
+    logs = db.query(SysOperationLog).filter(SysOperationLog.ref_id == id) \
+        .order_by(SysOperationLog.create_time.desc(), SysOperationLog.id.desc()).limit(DETAIL_CHILD_LIMIT).all()
+    
+    # 4. 名称批量解析 (客户与订单共用一次)
+    resolver = NameResolver(db).prefetch(
+        dept=[customer.dept_id],
+        user=[customer.owner_id] + [o.maker_id for o in orders],
+        product=[customer.intent_product_id] + [o.product_id for o in orders]
+    )
+    detail = CustomerDetail.from_orm(customer)
+    detail.dept_name = resolver.name("dept", customer.dept_id)
+    detail.owner_name = resolver.name("user", customer.owner_id)
+    detail.intent_product_name = resolver.name("product", customer.intent_product_id)
+    detail.follows = [FollowResponse.from_orm(f) for f in follows]
+    detail.logs = [LogResponse.from_orm(l) for l in logs]
+    for o in orders:
+        res = OrderResponse.from_orm(o)
+        res.product_name = resolver.name("product", o.product_id)
+        res.maker_name = resolver.name("user", o.maker_id)
+        detail.orders.append(fill_image_variants(res))
+    return detail
+
 # --- 2. 新增客户 ---
 @router.post("/", response_model=CustomerResponse)
 def create_customer(
@@ -109,10 +308,11 @@ def create_customer(
     db_item.follow_count = 0
         
     db.add(db_item)
+    db.flush()  # 获取自增 ID，日志与客户在同一事务中提交
+    bump_daily_stat(db, db_item.dept_id, db_item.source, new=1)
+    add_log(db, db_item.id, current_user.username, "新增客户", f"创建了客户: {item.customer_name}")
     db.commit()
     db.refresh(db_item)
-    
-    add_log(db, db_item.id, current_user.username, "新增客户", f"创建了客户: {item.customer_name}")
     return db_item
 
 # --- 3. 修改客户 ---
@@ -127,72 +327,114 @@ def update_customer(
     if not db_item:
         raise HTTPException(status_code=404, detail="客户不存在")
         
+    was_deal = db_item.is_deal == 1
     changes = []
     update_data = item.dict(exclude_unset=True)
+    
+    # 改门店/来源时，已计入的每日统计随客户移到新的门店/来源 (须在修改前读取旧值)
+    moved = {f: update_data[f] for f in ("dept_id", "source")
+             if f in update_data and str(getattr(db_item, f)) != str(update_data[f])}
+    if moved:
+        move_customer_stats(db, [id], dept_id=moved.get("dept_id", UNCHANGED), source=moved.get("source", UNCHANGED))
+    
     for field, value in update_data.items():
         old_val = getattr(db_item, field)
         if str(old_val) != str(value):
             changes.append(f"{field}: {old_val} -> {value}")
             setattr(db_item, field, value)
-            
-    db.commit()
-    db.refresh(db_item)
     
+    # 手动修改成交状态时同步每日统计
+    is_deal = db_item.is_deal == 1
+    if is_deal and not was_deal and not db_item.deal_time:
+        db_item.deal_time = datetime.now()
+    if is_deal != was_deal:
+        bump_daily_stat(db, db_item.dept_id, db_item.source, deal=1 if is_deal else -1,
+                        day=db_item.deal_time.date() if db_item.deal_time else None)
+            
     if changes:
         add_log(db, id, current_user.username, "修改客户", "; ".join(changes))
         
+    db.commit()
+    db.refresh(db_item)
     return db_item
 
 # --- 4. 客户跟进人批量转移 ---
 @router.post("/transfer")
 def transfer_customer(
     transfer_data: CustomerTransfer,
-    current_user: SysUser = Depends(get_current_user),
+    principal: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    user_role = db.query(SysRole).filter(SysRole.id == current_user.role_id).first()
-    is_admin = user_role and ('管理员' in user_role.role_name or 'admin' in user_role.role_code.lower())
-    is_leader = current_user.post == '店长' or (user_role and '店长' in user_role.role_name)
+    current_user = principal.user
+    policy = principal.policy
     
-    if not is_admin and not is_leader:
+    if not policy.can_transfer():
         raise HTTPException(status_code=403, detail="权限不足：只有管理员或店长可以批量转移客户")
 
-    new_owner = db.query(SysUser).filter(SysUser.id == transfer_data.new_owner_id).first()
+    new_owner = ref_cache.get(db, SysUser, transfer_data.new_owner_id)
     if not new_owner:
         raise HTTPException(status_code=404, detail="目标跟进人不存在")
 
-    transferred_count = 0
     new_owner_name = new_owner.username
+    requested_ids = list(dict.fromkeys(transfer_data.customer_ids))
+    
+    # 更新字段
+    values = {CrmCustomer.owner_id: transfer_data.new_owner_id}
+    if new_owner.dept_id:
+        values[CrmCustomer.dept_id] = new_owner.dept_id
     
-    for customer_id in transfer_data.customer_ids:
-        customer = db.query(CrmCustomer).filter(CrmCustomer.id == customer_id).first()
-        if not customer:
+    transferred_count = 0
+    for start in range(0, len(requested_ids), TRANSFER_BATCH_SIZE):
+        batch = requested_ids[start:start + TRANSFER_BATCH_SIZE]
+        
+        # 1. 批量加载目标客户，权限过滤在 SQL 中完成
+        query = db.query(CrmCustomer.id, CrmCustomer.owner_id).filter(CrmCustomer.id.in_(batch))
+        if not policy.is_admin:
+            query = query.filter(CrmCustomer.dept_id == current_user.dept_id)
+        targets = query.all()
+        if not targets:
             continue
-
-        if not is_admin:
-            if customer.dept_id != current_user.dept_id:
-                continue 
-
-        old_owner_name = "公海/未知"
-        if customer.owner_id:
-            old_u = db.query(SysUser).filter(SysUser.id == customer.owner_id).first()
-            if old_u: old_owner_name = old_u.username
-            
-        customer.owner_id = transfer_data.new_owner_id
+        
+        # 2. 改门店时每日统计随客户移动 (UPDATE 之前读取旧门店)
         if new_owner.dept_id:
-            customer.dept_id = new_owner.dept_id
-            
-        add_log(
-            db, 
-            customer_id, 
-            current_user.username, 
-            "转移客户", 
-            f"跟进人由 [{old_owner_name}] 转移至 [{new_owner_name}]"
-        )
-        transferred_count += 1
-            
+            move_customer_stats(db, [t.id for t in targets], dept_id=new_owner.dept_id)
+        
+        # 3. 原跟进人名称批量解析
+        old_owners = ref_cache.get_many(db, SysUser, [t.owner_id for t in targets])
+        
+        # 4. 一条 UPDATE ... WHERE id IN
+        db.query(CrmCustomer).filter(CrmCustomer.id.in_([t.id for t in targets])) \
+            .update(values, synchronize_session=False)
+        
+        # 5. 操作日志多行插入
+        db.execute(SysOperationLog.__table__.insert(), [
+            {
+                "ref_id": t.id,
+                "ref_type": "CUSTOMER",
+                "operator_name": current_user.username,
+                "action_type": "转移客户",
+                "content": f"跟进人由 [{old_owners[t.owner_id].username if t.owner_id in old_owners else '公海/未知'}] 转移至 [{new_owner_name}]"
+            }
+            for t in targets
+        ])
+        transferred_count += len(targets)
+    
     db.commit()
-    return {"msg": f"成功转移 {transferred_count} 个客户给 {new_owner_name}"}
+    rejected_count = len(requested_ids) - transferred_count
+    return {
+        "msg": f"成功转移 {transferred_count} 个客户给 {new_owner_name}",
+        "transferred": transferred_count,
+        "rejected": rejected_count
+    }
+
+# --- 4.1 导入客户 (后台任务，返回任务 ID 供轮询进度) ---
+@router.post("/import")
+def import_customers(
+    file: UploadFile = File(...),
+    current_user: SysUser = Depends(get_current_user)
+):
+    job = import_jobs.submit("customer", file, current_user_id=current_user.id, current_dept_id=current_user.dept_id)
+    return {"job_id": job.id, "status": job.status}
 
 # --- 5. 获取操作日志 ---
 @router.get("/{id}/logs", response_model=List[LogResponse])
@@ -204,6 +446,19 @@ def get_customer_logs(id: int, db: Session = Depends(get_db)):
 def get_customer_follows(id: int, db: Session = Depends(get_db)):
     return db.query(CrmFollowRecord).filter(CrmFollowRecord.customer_id == id).order_by(CrmFollowRecord.create_time.desc()).all()
 
+# --- 6.1 获取 AI 跟进话术 (批量任务生成，最新在前) ---
+@router.get("/{id}/ai_scripts", response_model=List[AIScriptResponse])
+def get_customer_ai_scripts(
+    id: int,
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
+):
+    query = db.query(CrmAiScript).join(CrmCustomer, CrmCustomer.id == CrmAiScript.customer_id) \
+        .filter(CrmAiScript.customer_id == id)
+    return principal.policy.apply_customer_scope(query).order_by(
+        CrmAiScript.create_time.desc()
+    ).limit(DETAIL_CHILD_LIMIT).all()
+
 # --- 7. 创建跟进记录 (核心功能：自动累加次数和更新时间) ---
 @router.post("/{id}/follows", response_model=FollowResponse)
 def create_customer_follow(
@@ -235,6 +490,7 @@ def create_customer_follow(
     # 4. 自动累加跟进次数
     current_count = customer.follow_count or 0
     customer.follow_count = current_count + 1
+    bump_daily_stat(db, customer.dept_id, customer.source, follow=1)
         
     # 5. 写入操作日志
     add_log(
@@ -9,13 +9,32 @@ export const getCustomerList = (params?: any) => {
   })
 }
 
-// 获取客户详情
-// 注意：目前复用列表接口或预留，如果后端支持 ID 过滤则生效
-export const getCustomerDetail = (id: number) => {
+// 分页获取客户列表 (游标分页)
+// params: { name, phone, status, cursor, limit, with_total }
+// 返回 { items, next_cursor, has_more, total }，翻页时把上一页的 next_cursor 作为 cursor 传入
+export const getCustomerPage = (params?: any) => {
   return request({ 
-    url: '/customers/', 
+    url: '/customers/page', 
     method: 'get', 
-    params: { id } 
+    params 
+  })
+}
+
+// 搜索客户 (姓名前缀 / 手机尾号 / 姓名小区地址全文检索，按相关度排序)
+// params: { q, cursor, limit }，返回结构同 getCustomerPage
+export const searchCustomers = (params: { q: string, cursor?: string, limit?: number }) => {
+  return request({ 
+    url: '/customers/search', 
+    method: 'get', 
+    params 
+  })
+}
+
+// 获取客户详情 (含最近的跟进、订单、日志；后端带 ETag，未变化时浏览器直接复用缓存)
+export const getCustomerDetail = (id: number) => {
+  return request({ 
+    url: `/customers/${id}`, 
+    method: 'get'
   })
 }
 
@@ -75,8 +94,27 @@ export const callAI = (prompt: string) => {
   })
 }
 
+// 获取客户的 AI 跟进话术 (批量任务生成)
+export const getCustomerAIScripts = (id: number) => {
+  return request({ 
+    url: `/customers/${id}/ai_scripts`, 
+    method: 'get' 
+  })
+}
+
 // --- 批量操作 ---
 
+// 导出客户 (与列表相同的筛选条件)，返回文件 Blob
+export const exportCustomers = (params: { name?: string, phone?: string, status?: string, format?: 'csv' | 'xlsx' }) => {
+  return request({ 
+    url: '/customers/export', 
+    method: 'get', 
+    params,
+    responseType: 'blob',
+    timeout: 0
+  })
+}
+
 // 批量转移跟进人
 export const transferCustomers = (data: { customer_ids: number[], new_owner_id: number, new_dept_id?: number }) => {
   return request({
@@ -0,0 +1,74 @@
+# backend/app/core/db_migrate.py
+from sqlalchemy import String, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from app.database import Base
+import app.models  # noqa: F401 注册所有模型
+
+def ensure_columns(engine: Engine) -> list:
+    """
+    为已存在的表补加模型中新增的列 (如 crm_customer.phone_rev 生成列)，
+    并把模型中加长了的 VARCHAR 列在库中同步加长 (如 crm_order.order_image_url)
+    :return: 新增 / 加长的列名列表
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c["name"]: c for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            ddl = CreateColumn(column).compile(dialect=engine.dialect)
+            if column.name not in existing:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                added.append(f"{table.name}.{column.name}")
+                continue
+            # 只加长，不缩短 (缩短可能截断已有数据)
+            new_length = getattr(column.type, "length", None)
+            old_length = getattr(existing[column.name]["type"], "length", None)
+            if isinstance(column.type, String) and new_length and old_length and new_length > old_length:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} MODIFY COLUMN {ddl}"))
+                added.append(f"{table.name}.{column.name} ({old_length} -> {new_length})")
+    return added
+
+# 已被新索引取代、需要从老表上删除的索引: 表名 -> 索引名
+OBSOLETE_INDEXES = {
+    "sys_operation_log": ["idx_log_ref_action_time"],
+}
+
+def ensure_indexes(engine: Engine) -> list:
+    """
+    为已存在的表补建模型中声明的索引，并删除 OBSOLETE_INDEXES 中已被取代的索引
+    create_all 只会创建缺失的表，不会给老表加索引，这里按索引名比对后逐个创建。
+    MySQL 8 的 ADD INDEX 默认为在线 DDL，不阻塞读写。
+    :return: 新建的索引名列表
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            # 只处理 __table_args__ 中显式声明的索引，跳过 Column(index=True) 生成的 ix_ 索引
+            if index.name in existing or index.name.startswith("ix_"):
+                continue
+            index.create(bind=engine)
+            created.append(f"{table.name}.{index.name}")
+        for name in OBSOLETE_INDEXES.get(table.name, []):
+            if name in existing:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} DROP INDEX {name}"))
+    return created
+
+# 命令行执行: python -m app.core.db_migrate (先补列，再补索引)
+if __name__ == "__main__":
+    from app.database import engine
+    columns = ensure_columns(engine)
+    print(f">>> [字段迁移] 新增/加长 {len(columns)} 个字段: {', '.join(columns) or '无'}")
+    names = ensure_indexes(engine)
+    print(f">>> [索引迁移] 新建 {len(names)} 个索引: {', '.join(names) or '无'}")
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from app.database import get_db
-from app.models import SysDept, SysUser
+from app.services.import_jobs import import_jobs
+from app.core.ref_cache import ref_cache
+from app.models import SysDept
+from app.core.name_resolver import NameResolver
 from app.schemas import DeptCreate, DeptUpdate, DeptResponse
 
 router = APIRouter()
@@ -32,13 +35,11 @@ def get_depts(name: Optional[str] = None, db: Session = Depends(get_db)):
         query = query.filter(SysDept.dept_name.like(f"%{name}%"))
     
     depts = query.all()
+    resolver = NameResolver(db).prefetch(user=[d.leader_id for d in depts])
     result = []
     for dept in depts:
         dept_data = DeptResponse.from_orm(dept)
-        if dept.leader_id:
-            leader = db.query(SysUser).filter(SysUser.id == dept.leader_id).first()
-            if leader:
-                dept_data.leader_name = leader.username
+        dept_data.leader_name = resolver.name("user", dept.leader_id)
         result.append(dept_data)
     return result
 
@@ -53,6 +54,7 @@ def create_dept(dept: DeptCreate, db: Session = Depends(get_db)):
     )
     db.add(db_dept)
     db.commit()
+    ref_cache.invalidate(SysDept)
     db.refresh(db_dept)
     return db_dept
 
@@ -67,6 +69,7 @@ def update_dept(dept_id: int, dept: DeptUpdate, db: Session = Depends(get_db)):
     db_dept.status = dept.status
     
     db.commit()
+    ref_cache.invalidate(SysDept)
     db.refresh(db_dept)
     return db_dept
 
@@ -77,6 +80,7 @@ def delete_dept(dept_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="门店不存在")
     db.delete(db_dept)
     db.commit()
+    ref_cache.invalidate(SysDept)
     return {"msg": "删除成功"}
 
 @router.put("/{dept_id}/status")
@@ -86,4 +90,11 @@ def toggle_status(dept_id: int, status: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="门店不存在")
     db_dept.status = status
     db.commit()
-    return {"msg": "状态更新成功"}
\ No newline at end of file
+    ref_cache.invalidate(SysDept)
+    return {"msg": "状态更新成功"}
+
+# --- 导入门店 (后台任务，返回任务 ID 供轮询进度) ---
+@router.post("/import")
+def import_depts(file: UploadFile = File(...)):
+    job = import_jobs.submit("dept", file)
+    return {"job_id": job.id, "status": job.status}
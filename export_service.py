@@ -0,0 +1,186 @@
+# backend/app/services/export_service.py
+import os
+import io
+import re
+import csv
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator, List
+from xml.sax.saxutils import escape
+from sqlalchemy.orm import Session
+from app.models import CrmCustomer
+from app.core.name_resolver import NameResolver
+
+# 配置: 服务端游标每批读取的行数
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+# 文件分块下发的大小 (xlsx 压缩输出攒够该大小后下发)
+EXPORT_CHUNK_SIZE = 256 * 1024
+
+# 导出列: (表头, 字段)；客户名称、手机号、来源、地址、微信号与导入模板的表头一致，
+# 门店、跟进人等其它列导入时会被忽略 (导入按地址自动分配门店与跟进人)
+CUSTOMER_EXPORT_COLUMNS = [
+    ("客户名称", CrmCustomer.customer_name),
+    ("手机号", CrmCustomer.phone),
+    ("来源", CrmCustomer.source),
+    ("地址", CrmCustomer.address),
+    ("门店", CrmCustomer.dept_id),
+    ("跟进人", CrmCustomer.owner_id),
+    ("跟进状态", CrmCustomer.follow_status),
+    ("是否成交", CrmCustomer.is_deal),
+    ("成交时间", CrmCustomer.deal_time),
+    ("跟进次数", CrmCustomer.follow_count),
+    ("最近跟进", CrmCustomer.last_follow_time),
+    ("微信号", CrmCustomer.wechat),
+    ("年龄", CrmCustomer.age),
+    ("决策人", CrmCustomer.decision_maker),
+    ("小区", CrmCustomer.community),
+    ("面积", CrmCustomer.house_area),
+    ("装修进度", CrmCustomer.decoration_progress),
+    ("意向产品", CrmCustomer.intent_product_id),
+    ("竞品", CrmCustomer.competitor),
+    ("到店日期", CrmCustomer.visit_date),
+    ("创建时间", CrmCustomer.create_time),
+]
+
+def _format(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return value
+
+class CustomerExporter:
+    """
+    客户流式导出
+    - stream_db 上以服务端游标 (stream_results) 分批读取，内存占用与总行数无关
+    - 游标未读完时该连接不能执行其它查询，名称解析使用另一个 Session (基础资料缓存命中时不查库)
+    """
+    def __init__(self, stream_db: Session, name_db: Session, query):
+        self.stream_db = stream_db
+        self.resolver = NameResolver(name_db)
+        self.query = query
+
+    def headers(self) -> List[str]:
+        return [label for label, _ in CUSTOMER_EXPORT_COLUMNS]
+
+    def iter_rows(self) -> Iterator[List[list]]:
+        """按批返回已解析名称的行"""
+        stmt = self.query.with_entities(*[col for _, col in CUSTOMER_EXPORT_COLUMNS]).order_by(
+            CrmCustomer.create_time.desc(), CrmCustomer.id.desc()
+        ).statement
+        result = self.stream_db.execute(
+            stmt, execution_options={"stream_results": True, "yield_per": EXPORT_BATCH_SIZE}
+        )
+        for batch in result.partitions():
+            self.resolver.prefetch(
+                dept=[r.dept_id for r in batch],
+                user=[r.owner_id for r in batch],
+                product=[r.intent_product_id for r in batch]
+            )
+            rows = []
+            for r in batch:
+                rows.append([
+                    r.customer_name, r.phone, r.source, r.address,
+                    self.resolver.name("dept", r.dept_id),
+                    self.resolver.name("user", r.owner_id),
+                    r.follow_status,
+                    "是" if r.is_deal else "否",
+                    _format(r.deal_time), r.follow_count, _format(r.last_follow_time),
+                    r.wechat, r.age, r.decision_maker, r.community, r.house_area, r.decoration_progress,
+                    self.resolver.name("product", r.intent_product_id),
+                    r.competitor, _format(r.visit_date), _format(r.create_time),
+                ])
+            yield rows
+
+    def iter_csv(self) -> Iterator[bytes]:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        # 表头先发出 (带 BOM 方便 Excel 直接打开中文)，客户端立即开始接收
+        writer.writerow(self.headers())
+        yield ("﻿" + buf.getvalue()).encode("utf-8")
+        for rows in self.iter_rows():
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows([["" if v is None else v for v in row] for row in rows])
+            yield buf.getvalue().encode("utf-8")
+
+    def iter_xlsx(self) -> Iterator[bytes]:
+        """
+        xlsx 是 zip 包: 以不可回退的方式 (数据描述符) 边写边压缩，工作表 XML 按批写入，压缩后的字节立即下发
+        只写最小的工作簿结构 (单个工作表、内联字符串、无样式)
+        """
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for name, content in _XLSX_STATIC_PARTS.items():
+                zf.writestr(name, content)
+            with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+                sheet.write(_XLSX_SHEET_HEAD.encode("utf-8"))
+                sheet.write(_xlsx_row(self.headers()).encode("utf-8"))
+                for rows in self.iter_rows():
+                    sheet.write("".join(_xlsx_row(row) for row in rows).encode("utf-8"))
+                    if sink.size() >= EXPORT_CHUNK_SIZE:
+                        yield sink.drain()
+                sheet.write(_XLSX_SHEET_TAIL.encode("utf-8"))
+        yield sink.drain()
+
+class _ChunkSink:
+    """zipfile 的输出目标: 只支持 write (zipfile 因此按流式格式写入)，由调用方取走已写出的字节"""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._size = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return self._size
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks, self._size = [], 0
+        return data
+
+# XML 1.0 不允许的控制字符 (客户资料中偶尔会粘贴进来)
+_XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def _xlsx_cell(value) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def _xlsx_row(row: list) -> str:
+    return "<row>" + "".join(_xlsx_cell(v) for v in row) + "</row>"
+
+_XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": _XML_DECL +
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>',
+    "_rels/.rels": _XML_DECL +
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>',
+    "xl/workbook.xml": _XML_DECL +
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="客户" sheetId="1" r:id="rId1"/></sheets></workbook>',
+    "xl/_rels/workbook.xml.rels": _XML_DECL +
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>',
+}
+_XLSX_SHEET_HEAD = _XML_DECL + '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+_XLSX_SHEET_TAIL = "</sheetData></worksheet>"
@@ -0,0 +1,109 @@
+# backend/app/services/file_index.py
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+from typing import Set
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from app.models import CrmOrder, SysFileObject
+from app.core.file_storage import FileStorage, StoredFile, filename_from_url, parse_variant_name, sniff_image_type
+
+# 清理保护期(小时): 先上传图片、后保存订单，保护期内的文件即使未被引用也不删除
+FILE_GC_GRACE_HOURS = int(os.getenv("FILE_GC_GRACE_HOURS", "24"))
+# 扫描订单图片字段时每批读取的行数
+FILE_GC_BATCH_SIZE = 2000
+
+def register_file(db: Session, stored: StoredFile) -> None:
+    """记录一次上传 (重复内容只刷新 last_upload_time)，只加入调用方的事务，不提交"""
+    stmt = mysql_insert(SysFileObject.__table__).values(
+        filename=stored.filename, size=stored.size, content_type=stored.content_type,
+        create_time=func.now(), last_upload_time=func.now()
+    )
+    db.execute(stmt.on_duplicate_key_update(last_upload_time=func.now()))
+
+def referenced_filenames(db: Session) -> Set[str]:
+    """订单图片字段中引用到的全部文件名 (字段中可能有逗号分隔的多张图片)"""
+    referenced: Set[str] = set()
+    result = db.execute(
+        CrmOrder.__table__.select().with_only_columns(CrmOrder.order_image_url).where(
+            CrmOrder.order_image_url.isnot(None), CrmOrder.order_image_url != ''
+        ),
+        execution_options={"stream_results": True, "yield_per": FILE_GC_BATCH_SIZE}
+    )
+    for (value,) in result:
+        for url in re.split(r"[,\s]+", value):
+            filename = filename_from_url(url)
+            if filename:
+                referenced.add(filename)
+    return referenced
+
+def collect_garbage(db: Session, storage: FileStorage, grace_hours: int = FILE_GC_GRACE_HOURS, dry_run: bool = False) -> dict:
+    """
+    删除没有任何订单引用、且超过保护期未被上传过的文件
+    逐个文件加行锁 (带 last_upload_time 条件重新读取) 后删除磁盘文件与索引行再提交：
+    同一文件的重新上传在登记时等待行锁，提交后发现文件已被删除会用上传内容补回；
+    只处理索引中登记过的文件，未登记的旧文件不会被删除。
+    """
+    cutoff = datetime.now() - timedelta(hours=grace_hours)
+    referenced = referenced_filenames(db)
+    candidates = db.query(SysFileObject.id, SysFileObject.filename, SysFileObject.size).filter(
+        SysFileObject.last_upload_time < cutoff
+    ).all()
+    stats = {"candidates": len(candidates), "referenced": 0, "deleted": 0, "freed_bytes": 0, "dry_run": dry_run}
+    for row in candidates:
+        if row.filename in referenced:
+            stats["referenced"] += 1
+            continue
+        if not dry_run:
+            locked = db.query(SysFileObject.id).filter(
+                SysFileObject.id == row.id, SysFileObject.last_upload_time < cutoff
+            ).with_for_update().first()
+            if not locked:
+                # 清理期间被重新上传过
+                db.rollback()
+                continue
+            try:
+                storage.delete(row.filename)
+                db.query(SysFileObject).filter(SysFileObject.id == row.id).delete(synchronize_session=False)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        stats["deleted"] += 1
+        stats["freed_bytes"] += row.size or 0
+    return stats
+
+def index_existing_files(db: Session, storage: FileStorage) -> int:
+    """把上传目录中尚未登记的文件补登到索引 (启用清理前执行一次，旧的平铺文件也会纳入清理范围)"""
+    count = 0
+    for root, _, files in os.walk(storage.upload_dir):
+        for name in files:
+            # 临时文件与缩略图不登记 (缩略图随原图一起删除)
+            if name.startswith(".tmp-") or ".tmp-" in name or parse_variant_name(name):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                content_type = sniff_image_type(f.read(16)) or ""
+            filename = os.path.relpath(path, storage.upload_dir).replace(os.sep, "/")
+            register_file(db, StoredFile(filename, os.path.getsize(path), content_type))
+            count += 1
+            if count % FILE_GC_BATCH_SIZE == 0:
+                db.commit()
+    db.commit()
+    return count
+
+if __name__ == "__main__":
+    # 用法: python -m app.services.file_index [--reindex] [--dry-run]
+    from app.database import SessionLocal, engine
+    from app.core.file_storage import upload_storage
+    SysFileObject.__table__.create(bind=engine, checkfirst=True)
+    session = SessionLocal()
+    try:
+        if "--reindex" in sys.argv:
+            print(f">>> [文件索引] 补登 {index_existing_files(session, upload_storage)} 个文件")
+        result = collect_garbage(session, upload_storage, dry_run="--dry-run" in sys.argv)
+        print(f">>> [文件清理] {result}")
+    finally:
+        session.close()
@@ -0,0 +1,153 @@
+# backend/app/core/file_serving.py
+import os
+import re
+import typing
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from urllib.parse import quote
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# X-Accel-Redirect 前缀 (对应 Nginx 中 internal 的 location)，为空时由后端自己发送文件
+UPLOAD_ACCEL_PREFIX = os.getenv("UPLOAD_ACCEL_PREFIX", "")
+# Nginx 转发时带上的请求头；直接访问后端端口的请求没有该头，仍由后端发送文件
+UPLOAD_ACCEL_HEADER = "x-accel-uploads"
+# 非内容寻址文件的浏览器缓存时间(秒)，到期后带 ETag 协商
+UPLOAD_CACHE_MAX_AGE = int(os.getenv("UPLOAD_CACHE_MAX_AGE", "86400"))
+# 内容寻址文件名变了内容才会变，可以永久缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 内容寻址文件名: ab/cd/<sha256>.<ext>，缩略图为 ab/cd/<sha256>_<名称>.jpg
+CAS_NAME_PATTERN = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(_[a-z]+)?\.[a-z0-9]+$")
+
+class RangeFileResponse(Response):
+    """
+    发送文件的 [start, end] 区间 (闭区间)
+    服务器支持 ASGI pathsend 扩展时整文件交给服务器发送 (sendfile)，否则分块读取
+    """
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: str, start: int, end: int, status_code: int = 200,
+                 headers: typing.Optional[typing.Mapping[str, str]] = None,
+                 media_type: typing.Optional[str] = None, method: typing.Optional[str] = None):
+        self.path = path
+        self.start = start
+        self.length = max(end - start + 1, 0)
+        self.status_code = status_code
+        self.send_header_only = method is not None and method.upper() == "HEAD"
+        self.media_type = media_type or guess_type(path)[0] or "application/octet-stream"
+        self.background = None
+        self.init_headers({**(headers or {}), "content-length": str(self.length)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if self.status_code == 200 and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": self.path})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # 文件在发送期间被截断
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def file_etag(filename: str, st: os.stat_result) -> str:
+    """强 ETag: 内容寻址原图直接用内容哈希，其它文件用 大小-修改时间 (文件只会被整体替换)"""
+    m = CAS_NAME_PATTERN.match(filename)
+    if m and not m.group(2):
+        return f'"{m.group(1)}"'
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+def cache_control(filename: str) -> str:
+    if CAS_NAME_PATTERN.match(filename):
+        return IMMUTABLE_CACHE_CONTROL
+    return f"public, max-age={UPLOAD_CACHE_MAX_AGE}"
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match 使用弱比较
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+def _if_range_matches(header: str, etag: str, mtime: float) -> bool:
+    """If-Range 可以是 ETag (强比较) 或 HTTP 日期 (与 Last-Modified 精确到秒比较)"""
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        return header == etag
+    try:
+        return int(parsedate_to_datetime(header).timestamp()) == int(mtime)
+    except (TypeError, ValueError):
+        return False
+
+def parse_range(header: str, size: int) -> typing.Optional[typing.Tuple[int, int]]:
+    """
+    解析单个 bytes 区间，返回 (start, end)；格式不支持 (如多区间) 时返回 None，按整文件发送
+    :raises ValueError: 区间无法满足 (416)
+    """
+    m = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header)
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):
+        # bytes=-N: 最后 N 个字节
+        suffix = int(m.group(2))
+        if suffix == 0:
+            raise ValueError(header)
+        return max(size - suffix, 0), size - 1
+    start = int(m.group(1))
+    end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+def serve_file(request: Request, filename: str, path: str) -> Response:
+    """
+    发送上传目录中的文件: ETag / If-None-Match (304)、Range / If-Range (206)、缓存头
+    配置了 UPLOAD_ACCEL_PREFIX 且请求经 Nginx 转发时只返回 X-Accel-Redirect，由 Nginx 直接发送文件；
+    此时 ETag / Last-Modified、If-None-Match、Range 都由 Nginx 按实际文件生成和判断，客户端看到的是 Nginx 的 ETag
+    """
+    st = os.stat(path)
+    etag = file_etag(filename, st)
+    media_type = guess_type(path)[0] or "application/octet-stream"
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+        "cache-control": cache_control(filename),
+        "accept-ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if UPLOAD_ACCEL_PREFIX and request.headers.get(UPLOAD_ACCEL_HEADER):
+        # Nginx 保留 Cache-Control 等头，自行生成 ETag 并处理条件请求、Range 与 sendfile
+        # (这里不带后端的 ETag，Nginx 会以自己的为准，两者格式不同)
+        return Response(media_type=media_type, headers={
+            "cache-control": headers["cache-control"],
+            "x-accel-redirect": UPLOAD_ACCEL_PREFIX.rstrip("/") + "/" + quote(filename),
+        })
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range 不匹配 (文件已变化) 时忽略 Range，返回完整文件
+    if range_header and (not if_range or _if_range_matches(if_range, etag, st.st_mtime)):
+        try:
+            byte_range = parse_range(range_header, st.st_size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{st.st_size}"})
+        if byte_range:
+            start, end = byte_range
+            return RangeFileResponse(path, start, end, status_code=206, media_type=media_type, method=request.method,
+                                     headers={**headers, "content-range": f"bytes {start}-{end}/{st.st_size}"})
+    return RangeFileResponse(path, 0, st.st_size - 1, media_type=media_type, method=request.method, headers=headers)
@@ -1,10 +1,123 @@
 # backend/app/core/file_storage.py
+import io
 import os
 import uuid
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, NamedTuple, Optional
+from PIL import Image, ImageOps
+
+# 配置: 单个文件大小上限(字节)、允许的图片类型、读写分块大小
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_ALLOWED_TYPES = set(
+    t.strip() for t in os.getenv("UPLOAD_ALLOWED_TYPES", "image/jpeg,image/png,image/gif,image/webp,image/heic").split(",") if t.strip()
+)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# 存储方式: cas = 按内容哈希命名并分级目录存放 (相同内容只存一份)；flat = 旧的 UUID 平铺方式
+STORAGE_MODE = os.getenv("STORAGE_MODE", "cas")
+
+# 缩略图: 名称 -> 最大宽高；生成的文件与原图放在同一目录，如 <原名>_thumb.jpg
+IMAGE_VARIANTS = {
+    "thumb": int(os.getenv("IMAGE_THUMB_SIZE", "240")),
+    "preview": int(os.getenv("IMAGE_PREVIEW_SIZE", "1280")),
+}
+IMAGE_VARIANT_QUALITY = int(os.getenv("IMAGE_VARIANT_QUALITY", "82"))
+# 后台生成缩略图的线程数
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+# Pillow 可以直接解码的类型 (HEIC 等其它类型不生成缩略图，直接使用原图)
+VARIANT_SOURCE_TYPES = {"jpg", "jpeg", "png", "gif", "webp"}
+# 生成缩略图的原图像素上限: 只读文件头就能拿到尺寸，超过时不解码 (防止小文件解压出超大位图)
+IMAGE_VARIANT_MAX_PIXELS = int(os.getenv("IMAGE_VARIANT_MAX_PIXELS", str(60 * 1000 * 1000)))
+
+# 图片类型 -> 保存时使用的扩展名
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/heic": "heic",
+}
+
+class StoredFile(NamedTuple):
+    """保存结果: filename 为相对上传目录的路径 (也是 /uploads/ 之后的 URL 部分)"""
+    filename: str
+    size: int
+    content_type: str
+    deduplicated: bool = False
+
+class UploadError(Exception):
+    """上传被拒绝，status_code 为返回给前端的 HTTP 状态码"""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def filename_from_url(url: str) -> Optional[str]:
+    """图片 URL (/uploads/xxx 或 IMG_BASE_URL/xxx) -> 相对上传目录的文件名"""
+    url = (url or "").strip().split("?", 1)[0]
+    if not url:
+        return None
+    base_url = os.getenv("IMG_BASE_URL", "").rstrip("/")
+    if base_url and url.startswith(base_url + "/"):
+        return url[len(base_url) + 1:]
+    marker = "/uploads/"
+    if marker in url:
+        return url.split(marker, 1)[1]
+    return None
+
+def variant_name(filename: str, variant: str) -> str:
+    """ab/cd/xxx.png -> ab/cd/xxx_thumb.jpg"""
+    return f"{os.path.splitext(filename)[0]}_{variant}.jpg"
+
+def parse_variant_name(filename: str) -> Optional[tuple]:
+    """variant_name 的逆运算: 返回 (原图文件名去掉扩展名, 缩略图名称)，不是缩略图文件名时返回 None"""
+    stem, ext = os.path.splitext(filename)
+    if ext != ".jpg":
+        return None
+    for variant in IMAGE_VARIANTS:
+        if stem.endswith(f"_{variant}"):
+            return stem[:-len(variant) - 1], variant
+    return None
+
+def variant_url(value: Optional[str], variant: str) -> Optional[str]:
+    """
+    图片 URL (可能逗号分隔多张) -> 对应缩略图 URL
+    不是本系统上传的图片、或格式不支持生成缩略图时保留原 URL
+    """
+    if not value:
+        return value
+    urls = []
+    for url in value.split(","):
+        url = url.strip()
+        filename = filename_from_url(url)
+        if filename and os.path.splitext(filename)[1].lstrip(".").lower() in VARIANT_SOURCE_TYPES:
+            # 原图 URL 上的查询参数不适用于缩略图，用文件名之前的部分重新拼接
+            path = url.split("?", 1)[0]
+            url = path[:len(path) - len(filename)] + variant_name(filename, variant)
+        urls.append(url)
+    return ",".join(urls)
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """按文件头识别图片类型，不信任客户端声明的 Content-Type"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return None
 
 class FileStorage:
-    def __init__(self, upload_dir: str):
+    def __init__(self, upload_dir: str, max_bytes: int = UPLOAD_MAX_BYTES):
         self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
         # 确保目录存在，如果不存在则创建
         # 在 Docker 映射模式下，这通常对应宿主机的 /store_scrm-FTP
         if not os.path.exists(self.upload_dir):
@@ -13,26 +126,184 @@ class FileStorage:
             except Exception as e:
                 print(f"Warning: Could not create upload directory {self.upload_dir}. Error: {e}")
 
+    def save_stream(self, stream: BinaryIO, content_type: Optional[str] = None,
+                    register: Optional[Callable[[StoredFile], None]] = None) -> StoredFile:
+        """
+        分块保存上传的图片 (同步阻塞，接口中应放到线程池执行)
+        先写入同目录下的临时文件，边写边计算 SHA-256，校验通过后再原子重命名，失败时不会留下残缺文件
+        cas 模式下文件名即内容哈希，已存在相同内容时丢弃临时文件，直接返回已有文件
+        :param stream: 可读的二进制流 (如 UploadFile.file)
+        :param content_type: 客户端声明的类型，仅作参考 (微信、安卓 WebView 常声明为 application/octet-stream
+                             或 image/jpg)，是否接受只按文件头识别出的类型判断
+        :param register: 文件名确定后、落盘之前调用 (登记文件索引)；抛出异常时上传失败，不留下文件。
+                         先登记再判断文件是否已存在，清理任务在登记之前删掉的同名文件会用本次内容补回
+        """
+        tmp_path = os.path.join(self.upload_dir, f".tmp-{uuid.uuid4().hex}")
+        try:
+            digest = hashlib.sha256()
+            with open(tmp_path, "wb") as f:
+                head = stream.read(UPLOAD_CHUNK_SIZE)
+                if not head:
+                    raise UploadError(400, "文件为空")
+                image_type = sniff_image_type(head)
+                if image_type not in UPLOAD_ALLOWED_TYPES:
+                    raise UploadError(415, "文件内容不是支持的图片格式")
+                size = 0
+                for chunk in self._chunks(head, stream):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadError(413, f"文件超过大小上限 ({self.max_bytes / 1024 / 1024:.1f}MB)")
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            ext = IMAGE_EXTENSIONS[image_type]
+            if STORAGE_MODE != "cas":
+                new_filename = f"{uuid.uuid4()}.{ext}"
+                if register:
+                    register(StoredFile(new_filename, size, image_type))
+                os.replace(tmp_path, self.path_for(new_filename))
+                return StoredFile(new_filename, size, image_type)
+
+            hex_digest = digest.hexdigest()
+            new_filename = f"{hex_digest[:2]}/{hex_digest[2:4]}/{hex_digest}.{ext}"
+            final_path = self.path_for(new_filename)
+            if register:
+                register(StoredFile(new_filename, size, image_type))
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+                return StoredFile(new_filename, size, image_type, deduplicated=True)
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            # 并发上传相同内容时两边都会走到这里，rename 是原子的且内容相同，结果一致
+            os.replace(tmp_path, final_path)
+            return StoredFile(new_filename, size, image_type)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def path_for(self, filename: str) -> str:
+        """相对文件名 -> 磁盘路径 (拒绝跳出上传目录的路径)"""
+        path = os.path.normpath(os.path.join(self.upload_dir, filename))
+        if not path.startswith(os.path.normpath(self.upload_dir) + os.sep):
+            raise ValueError(f"非法文件名: {filename}")
+        return path
+
+    def delete(self, filename: str) -> bool:
+        """删除文件及其缩略图"""
+        for variant in IMAGE_VARIANTS:
+            try:
+                os.remove(self.path_for(variant_name(filename, variant)))
+            except FileNotFoundError:
+                pass
+        try:
+            os.remove(self.path_for(filename))
+            return True
+        except FileNotFoundError:
+            return False
+
+    # --- 缩略图 ---
+    def generate_variants(self, filename: str, variants: Iterable[str] = IMAGE_VARIANTS) -> None:
+        """按需生成缩略图 (已存在的跳过)；一次解码原图，从大到小依次缩放"""
+        if os.path.splitext(filename)[1].lstrip(".").lower() not in VARIANT_SOURCE_TYPES:
+            return
+        todo = [v for v in variants if not os.path.exists(self.path_for(variant_name(filename, v)))]
+        if not todo:
+            return
+        todo.sort(key=lambda v: IMAGE_VARIANTS[v], reverse=True)
+        with Image.open(self.path_for(filename)) as img:
+            width, height = img.size
+            if width * height > IMAGE_VARIANT_MAX_PIXELS:
+                raise ValueError(f"图片尺寸过大 ({width}x{height})，不生成缩略图")
+            # JPEG 解码时直接按比例缩小，大幅减少大照片的解码开销
+            img.draft("RGB", (IMAGE_VARIANTS[todo[0]], IMAGE_VARIANTS[todo[0]]))
+            # 手机照片的方向记录在 EXIF 中，缩略图需要先转正
+            img = ImageOps.exif_transpose(img)
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            for variant in todo:
+                size = IMAGE_VARIANTS[variant]
+                img.thumbnail((size, size), Image.LANCZOS)
+                target = self.path_for(variant_name(filename, variant))
+                tmp_path = f"{target}.tmp-{uuid.uuid4().hex}"
+                try:
+                    img.save(tmp_path, "JPEG", quality=IMAGE_VARIANT_QUALITY, optimize=True, progressive=True)
+                    os.replace(tmp_path, target)
+                except BaseException:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                    raise
+
+    def _generate_variants_safely(self, filename: str) -> None:
+        try:
+            self.generate_variants(filename)
+        except Exception as e:
+            # 后台生成失败不影响上传，访问时会再按需生成
+            print(f">>> [缩略图] 生成失败 {filename}: {str(e)}")
+
+    def schedule_variants(self, filename: str) -> None:
+        """上传完成后交给后台线程池生成缩略图"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS, thread_name_prefix="variant")
+            executor = self._executor
+        executor.submit(self._generate_variants_safely, filename)
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """
+        访问文件时的磁盘路径；请求的缩略图不存在时按需生成 (如后台任务尚未完成或文件被清理)
+        :return: 路径，文件不存在时返回 None
+        """
+        path = self.path_for(filename)
+        if os.path.isfile(path):
+            return path
+        parsed = parse_variant_name(filename)
+        if not parsed:
+            return None
+        stem, variant = parsed
+        # 旧的平铺文件保留了上传时的扩展名，大小写都可能出现
+        for ext in [e for t in VARIANT_SOURCE_TYPES for e in (t, t.upper())]:
+            original = f"{stem}.{ext}"
+            if os.path.isfile(self.path_for(original)):
+                try:
+                    self.generate_variants(original, [variant])
+                except Exception as e:
+                    print(f">>> [缩略图] 生成失败 {original}: {str(e)}")
+                return path if os.path.isfile(path) else None
+        return None
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _chunks(head: bytes, stream: BinaryIO) -> Iterable[bytes]:
+        if head:
+            yield head
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
     def save_file(self, file_content: bytes, original_filename: str) -> str:
         """
         保存文件到本地存储
         :param file_content: 文件的二进制内容
-        :param original_filename: 原始文件名
-        :return: 保存后的新文件名 (UUID)
+        :param original_filename: 原始文件名 (扩展名以实际图片类型为准)
+        :return: 保存后的新文件名
         """
-        # 1. 生成唯一文件名，保留原始扩展名
-        if '.' in original_filename:
-            ext = original_filename.split('.')[-1]
-        else:
-            ext = "jpg" # 默认后缀
-            
-        new_filename = f"{uuid.uuid4()}.{ext}"
-        
-        # 2. 拼接完整路径
-        file_path = os.path.join(self.upload_dir, new_filename)
-
-        # 3. 写入文件
-        with open(file_path, "wb") as f:
-            f.write(file_content)
-            
-        return new_filename
\ No newline at end of file
+        return self.save_stream(io.BytesIO(file_content)).filename
+
+# 全局单例: 图片上传目录
+upload_storage = FileStorage(os.getenv("UPLOAD_DIR", "/app/uploads"))
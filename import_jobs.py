@@ -0,0 +1,155 @@
+# backend/app/services/import_jobs.py
+import os
+import csv
+import io
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+from fastapi import UploadFile
+from app.database import SessionLocal
+from app.services.import_service import ImportService, estimate_rows
+
+# 配置: 后台导入线程数、已结束任务的保留时间(秒)
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+IMPORT_JOB_RETENTION = int(os.getenv("IMPORT_JOB_RETENTION", "3600"))
+
+# 任务类型 -> ImportService 方法名
+IMPORT_KINDS = {
+    "customer": "process_customer_import",
+    "dept": "process_dept_import",
+    "product": "process_product_import",
+    "user": "process_user_import",
+    "allocation": "process_allocation_import",
+}
+
+class ImportJob:
+    """一次后台导入任务的状态"""
+    def __init__(self, kind: str, filename: Optional[str], path: str, kwargs: dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.filename = filename
+        self.path = path
+        self.kwargs = kwargs
+        self.status = "pending"  # pending / running / success / failed
+        self.error: Optional[str] = None
+        self.results: dict = {"total": 0, "success": 0, "failed": 0, "skipped": 0, "errors": []}
+        self.estimated_total: Optional[int] = None
+        self.create_time = datetime.now()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, results: dict) -> None:
+        with self._lock:
+            self.results = {**results, "errors": list(results.get("errors", []))}
+
+    def eta_seconds(self) -> Optional[float]:
+        processed = self.results.get("total", 0)
+        if self.status != "running" or not self.started_at or not processed or not self.estimated_total:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        remaining = max(self.estimated_total - processed, 0)
+        return round(elapsed / processed * remaining, 1)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            r = self.results
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "filename": self.filename,
+                "status": self.status,
+                "error": self.error,
+                "estimated_total": self.estimated_total,
+                "processed": r.get("total", 0),
+                "success": r.get("success", 0),
+                "skipped": r.get("skipped", 0),
+                "failed": r.get("failed", 0),
+                "error_count": len(r.get("errors", [])),
+                "eta_seconds": self.eta_seconds(),
+                "create_time": self.create_time,
+            }
+
+    def report_csv(self) -> str:
+        """当前(可能是部分)结果的 CSV 报告"""
+        with self._lock:
+            r = self.results
+            errors = list(r.get("errors", []))
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(["任务", "状态", "已处理", "成功", "跳过", "失败"])
+        writer.writerow([self.id, self.status, r.get("total", 0), r.get("success", 0), r.get("skipped", 0), r.get("failed", 0)])
+        writer.writerow([])
+        writer.writerow(["错误信息"])
+        for e in errors:
+            writer.writerow([e])
+        return buf.getvalue()
+
+class ImportJobManager:
+    """
+    后台导入任务管理
+    上传文件先落盘到临时文件，再交给线程池处理；每个任务使用独立的数据库 Session，
+    ImportService 按批提交，单批失败不会回滚已提交的批次。
+    """
+    def __init__(self, workers: int = IMPORT_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import")
+        self._jobs: Dict[str, ImportJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, file: UploadFile, **kwargs) -> ImportJob:
+        self._prune()
+        suffix = os.path.splitext(file.filename or "")[1]
+        fd, path = tempfile.mkstemp(prefix="scrm_import_", suffix=suffix)
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(file.file, f, 1024 * 1024)
+        job = ImportJob(kind, file.filename, path, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ImportJob) -> None:
+        db = SessionLocal()
+        try:
+            job.status = "running"
+            job.started_at = time.monotonic()
+            job.estimated_total = estimate_rows(job.path, job.filename)
+            method = getattr(ImportService(db), IMPORT_KINDS[job.kind])
+            results = method(job.path, filename=job.filename, progress=job.update, **job.kwargs)
+            job.update(results)
+            job.status = "success"
+        except Exception as e:
+            db.rollback()
+            job.error = getattr(e, "detail", None) or str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.monotonic()
+            db.close()
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for job_id in [
+                k for k, j in self._jobs.items()
+                if j.finished_at and now - j.finished_at > IMPORT_JOB_RETENTION
+            ]:
+                del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+# 全局单例
+import_jobs = ImportJobManager()
@@ -1,166 +1,385 @@
+import io
+import openpyxl
 import pandas as pd
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.models import CrmCustomer, SysRegionAllocation, SysDept, CrmProduct, SysUser, SysRole
-from app.core.security import get_password_hash
+from app.core.security import hash_passwords
 from app.services.allocation_service import AllocationService
+from app.services.region_matcher import invalidate_region_matcher
+from app.core.ref_cache import ref_cache
+from app.services.stats_service import bump_daily_stats
 from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Union
+
+# 批量导入每批行数 (IN 查询与多行 INSERT 共用)
+IMPORT_CHUNK_SIZE = 1000
+
+def normalize_phones(phones: pd.Series) -> pd.Series:
+    """
+    向量化规范手机号
+    去掉 Excel 数值化产生的 ".0"、空格与横线、+86/86 国家码前缀
+    """
+    return (
+        phones.fillna('').astype(str)
+        .str.replace(r'\.0$', '', regex=True)
+        .str.replace(r'[\s\-]', '', regex=True)
+        .str.replace(r'^\+?86(?=1\d{10}$)', '', regex=True)
+    )
+
+ImportSource = Union[bytes, str, BinaryIO]
+
+# 进度回调: 每批处理完成后传入当前统计结果
+ProgressCallback = Callable[[dict], None]
+
+def estimate_rows(path: str, filename: Optional[str] = None) -> Optional[int]:
+    """
+    估算导入文件的数据行数 (不含表头)，用于计算进度与剩余时间
+    xlsx 读取 sheet 的维度信息，csv 统计换行数，无法估算时返回 None
+    """
+    try:
+        fmt = _detect_format(path, filename)
+        if fmt == 'xlsx':
+            wb = openpyxl.load_workbook(path, read_only=True)
+            try:
+                max_row = wb.active.max_row
+            finally:
+                wb.close()
+            return max(max_row - 1, 0) if max_row else None
+        if fmt == 'csv':
+            lines = 0
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    lines += block.count(b'\n')
+            return max(lines - 1, 0)
+    except Exception:
+        pass
+    return None
+
+def _detect_format(source: ImportSource, filename: Optional[str]) -> str:
+    name = (filename or (source if isinstance(source, str) else '')).lower()
+    for ext in ('csv', 'xls', 'xlsx'):
+        if name.endswith('.' + ext):
+            return ext
+    # 无文件名时按文件头判断: xlsx 为 zip (PK)，xls 为 OLE2
+    if isinstance(source, (bytes, bytearray)):
+        head = bytes(source[:8])
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            head = f.read(8)
+    else:
+        pos = source.tell()
+        head = source.read(8)
+        source.seek(pos)
+    if head.startswith(b'PK'):
+        return 'xlsx'
+    if head.startswith(b'\xd0\xcf\x11\xe0'):
+        return 'xls'
+    return 'csv'
+
+def _detect_encoding(stream: BinaryIO) -> str:
+    """CSV 编码探测: 渠道导出的文件常见 GBK"""
+    pos = stream.tell()
+    head = stream.read(64 * 1024)
+    stream.seek(pos)
+    try:
+        head.decode('utf-8')
+        return 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # 截断在多字节字符中间不算错误
+        return 'utf-8-sig' if e.start >= len(head) - 3 else 'gbk'
+
+def _iter_raw_chunks(source: ImportSource, filename: Optional[str]) -> Iterator[pd.DataFrame]:
+    fmt = _detect_format(source, filename)
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+    if fmt == 'csv':
+        if isinstance(stream, str):
+            with open(stream, 'rb') as f:
+                yield from _iter_csv_chunks(f)
+        else:
+            yield from _iter_csv_chunks(stream)
+    elif fmt == 'xls':
+        # 旧版 xls 不支持流式读取，整表读入后分批处理
+        df = pd.read_excel(stream, dtype=object)
+        for start in range(0, len(df), IMPORT_CHUNK_SIZE):
+            yield df.iloc[start:start + IMPORT_CHUNK_SIZE]
+    else:
+        # xlsx 使用 openpyxl 只读模式逐行读取
+        wb = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(h).strip() if h is not None else f"列{i+1}" for i, h in enumerate(header)]
+            width = len(columns)
+            buf, start = [], 0
+            for row in rows:
+                buf.append((tuple(row) + (None,) * width)[:width])
+                if len(buf) >= IMPORT_CHUNK_SIZE:
+                    yield pd.DataFrame(buf, columns=columns, index=range(start, start + len(buf)), dtype=object)
+                    start += len(buf)
+                    buf = []
+            if buf:
+                yield pd.DataFrame(buf, columns=columns, index=range(start, start + len(buf)), dtype=object)
+        finally:
+            wb.close()
+
+def _iter_csv_chunks(stream: BinaryIO) -> Iterator[pd.DataFrame]:
+    encoding = _detect_encoding(stream)
+    reader = pd.read_csv(stream, dtype=str, encoding=encoding, chunksize=IMPORT_CHUNK_SIZE, skip_blank_lines=True)
+    for chunk in reader:
+        chunk.columns = [str(c).strip() for c in chunk.columns]
+        yield chunk
+
+def _strip_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """按列统一转为字符串并去除空格 (空单元格为 None)"""
+    df = df.dropna(how='all')
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        out[col] = values.astype(str).str.strip().astype(object).where(values.notna(), None)
+    return pd.DataFrame(out, index=df.index)
 
 class ImportService:
     def __init__(self, db: Session):
         self.db = db
 
-    def _read_excel(self, file_contents: bytes) -> pd.DataFrame:
+    def _iter_chunks(self, source: ImportSource, column_map: Dict[str, str], filename: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        流式读取导入文件，按批返回已映射列名、已去空格的 DataFrame
+        :param source: 文件内容 (bytes)、文件路径或文件对象
+        :param filename: 原始文件名，用于识别 csv/xls/xlsx
+        :return: 每批最多 IMPORT_CHUNK_SIZE 行，index 为数据行序号 (从 0 开始，不含表头)
+        """
         try:
-            df = pd.read_excel(file_contents)
-            df = df.dropna(how='all') 
-            # 统一转为字符串并去除空格
-            df = df.applymap(lambda x: str(x).strip() if pd.notnull(x) else None)
-            return df
+            for chunk in _iter_raw_chunks(source, filename):
+                chunk = chunk.rename(columns=column_map)
+                chunk = _strip_chunk(chunk)
+                if len(chunk):
+                    yield chunk
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Excel 解析失败: {str(e)}")
 
     # --- 1. 客户导入 ---
-    def process_customer_import(self, file_contents: bytes, current_user_id: int, current_dept_id: int):
-        df = self._read_excel(file_contents)
+    def process_customer_import(self, source: ImportSource, current_user_id: int, current_dept_id: int, filename: Optional[str] = None, progress: Optional[ProgressCallback] = None):
         column_map = {
             '客户名称': 'customer_name', '姓名': 'customer_name',
             '手机号': 'phone', '电话': 'phone',
             '地址': 'address', '详细地址': 'address',
             '来源': 'source', '微信号': 'wechat',
         }
-        df.rename(columns=column_map, inplace=True)
-        
-        results = {"total": len(df), "success": 0, "failed": 0, "skipped": 0, "errors": []}
+        results = {"total": 0, "success": 0, "failed": 0, "skipped": 0, "errors": []}
         alloc_service = AllocationService(self.db) # 引入自动分配服务
+        seen_phones: Set[str] = set()
         
-        for index, row in df.iterrows():
-            try:
-                phone = row.get('phone')
-                if not phone: continue
-                
-                if self.db.query(CrmCustomer).filter(CrmCustomer.phone == phone).first():
-                    results['skipped'] += 1
-                    continue
-
-                address = row.get('address') or ''
-                
-                # 自动分配
-                target_dept_id, target_owner_id = alloc_service.auto_allocate(address)
-                
-                # 未匹配则归属导入人
-                if not target_dept_id:
-                    target_dept_id = current_dept_id
-                    target_owner_id = current_user_id
-                
-                customer = CrmCustomer(
-                    customer_name=row.get('customer_name', '未知'),
-                    phone=phone,
-                    source=row.get('source', 'Excel导入'),
-                    address=address,
-                    wechat=row.get('wechat'),
-                    dept_id=target_dept_id,
-                    owner_id=target_owner_id,
-                    follow_status="待分配",
-                    follow_count=0 
-                )
-                self.db.add(customer)
-                results['success'] += 1
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"第{index+2}行: {str(e)}")
+        for df in self._iter_chunks(source, column_map, filename):
+            results['total'] += len(df)
+            if 'phone' not in df.columns:
+                if progress: progress(results)
+                continue
+            
+            # 1. 向量化规范手机号，无手机号的行直接忽略
+            df['phone'] = normalize_phones(df['phone'])
+            df = df[df['phone'] != '']
+            
+            # 2. 文件内去重 (保留首次出现，跨批次)
+            dup_mask = df.duplicated(subset='phone', keep='first') | df['phone'].isin(seen_phones)
+            results['skipped'] += int(dup_mask.sum())
+            df = df[~dup_mask]
+            seen_phones.update(df['phone'])
+            
+            # 3. IN 查询库中已存在的手机号
+            existing = self._existing_values(CrmCustomer.phone, df['phone'].tolist())
+            exist_mask = df['phone'].isin(existing)
+            results['skipped'] += int(exist_mask.sum())
+            df = df[~exist_mask]
+            
+            # 4. 多行插入，每批一个事务，单批失败不影响其它批次
+            rows, row_nos = [], []
+            for index, row in zip(df.index, df.to_dict('records')):
+                try:
+                    address = row.get('address') or ''
+                    
+                    # 自动分配
+                    target_dept_id, target_owner_id = alloc_service.auto_allocate(address)
+                    
+                    # 未匹配则归属导入人
+                    if not target_dept_id:
+                        target_dept_id = current_dept_id
+                        target_owner_id = current_user_id
+                    
+                    rows.append(dict(
+                        customer_name=row.get('customer_name', '未知'),
+                        phone=row['phone'],
+                        source=row.get('source', 'Excel导入'),
+                        address=address,
+                        wechat=row.get('wechat'),
+                        dept_id=target_dept_id,
+                        owner_id=target_owner_id,
+                        follow_status="待分配",
+                        follow_count=0
+                    ))
+                    row_nos.append(index + 2)
+                except Exception as e:
+                    results['failed'] += 1
+                    results['errors'].append(f"第{index+2}行: {str(e)}")
+            if rows:
+                try:
+                    self.db.execute(CrmCustomer.__table__.insert(), rows)
+                    today = datetime.now().date()
+                    bump_daily_stats(self.db, [(today, r['dept_id'], r['source'], 1, 0, 0) for r in rows])
+                    self.db.commit()
+                    results['success'] += len(rows)
+                except Exception as e:
+                    self.db.rollback()
+                    results['failed'] += len(rows)
+                    results['errors'].append(f"第{row_nos[0]}-{row_nos[-1]}行写入失败: {str(e)}")
+            if progress: progress(results)
         
-        self.db.commit()
         return results
 
+    def _existing_values(self, column, values: List[str]) -> Set[str]:
+        """分批 IN 查询，返回库中已存在的值"""
+        existing = set()
+        for start in range(0, len(values), IMPORT_CHUNK_SIZE):
+            batch = values[start:start + IMPORT_CHUNK_SIZE]
+            existing.update(v for (v,) in self.db.query(column).filter(column.in_(batch)).all())
+        return existing
+
+    def _name_map(self, name_column, id_column, names: List[Optional[str]]) -> Dict[str, int]:
+        """批量把名称转为 ID，同名时取 ID 最小的一条"""
+        names = list({n for n in names if n})
+        if not names:
+            return {}
+        mapping: Dict[str, int] = {}
+        rows = self.db.query(name_column, id_column).filter(name_column.in_(names)).order_by(id_column).all()
+        for name, id in rows:
+            mapping.setdefault(name, id)
+        return mapping
+
+    def _commit_chunk(self, results: dict, df: pd.DataFrame, success_before: int, progress: Optional[ProgressCallback]) -> None:
+        """按批提交: 本批写入失败只回滚本批，已提交的批次不受影响"""
+        try:
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            written = results['success'] - success_before
+            results['success'] = success_before
+            results['failed'] += written
+            results['errors'].append(f"第{df.index[0]+2}-{df.index[-1]+2}行写入失败: {str(e)}")
+        if progress: progress(results)
+
     # --- 2. 门店导入 ---
-    def process_dept_import(self, file_contents: bytes):
-        df = self._read_excel(file_contents)
+    def process_dept_import(self, source: ImportSource, filename: Optional[str] = None, progress: Optional[ProgressCallback] = None):
         column_map = {'门店名称': 'dept_name', '店长': 'leader_name'}
-        df.rename(columns=column_map, inplace=True)
-        results = {"total": len(df), "success": 0, "failed": 0, "errors": []}
+        results = {"total": 0, "success": 0, "failed": 0, "errors": []}
         prefix = datetime.now().strftime('%Y%m%d')
         
-        for index, row in df.iterrows():
-            try:
-                dept_name = row.get('dept_name')
-                if not dept_name: continue
-                if self.db.query(SysDept).filter(SysDept.dept_name == dept_name).first(): continue
+        for df in self._iter_chunks(source, column_map, filename):
+            results['total'] += len(df)
+            success_before = results['success']
+            for index, row in zip(df.index, df.to_dict('records')):
+                try:
+                    dept_name = row.get('dept_name')
+                    if not dept_name: continue
+                    if self.db.query(SysDept).filter(SysDept.dept_name == dept_name).first(): continue
                 
-                leader_id = None
-                leader_name = row.get('leader_name')
-                if leader_name:
-                    user = self.db.query(SysUser).filter(SysUser.username == leader_name).first()
-                    if user: leader_id = user.id
+                    leader_id = None
+                    leader_name = row.get('leader_name')
+                    if leader_name:
+                        user = self.db.query(SysUser).filter(SysUser.username == leader_name).first()
+                        if user: leader_id = user.id
                 
-                count = self.db.query(SysDept).filter(SysDept.dept_code.like(f"{prefix}%")).count()
-                code = f"{prefix}{count + 1 + index:04d}"
-                dept = SysDept(dept_code=code, dept_name=dept_name, leader_id=leader_id, status=1)
-                self.db.add(dept)
-                results['success'] += 1
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"第{index+2}行: {str(e)}")
-        self.db.commit()
+                    count = self.db.query(SysDept).filter(SysDept.dept_code.like(f"{prefix}%")).count()
+                    code = f"{prefix}{count + 1 + index:04d}"
+                    dept = SysDept(dept_code=code, dept_name=dept_name, leader_id=leader_id, status=1)
+                    self.db.add(dept)
+                    results['success'] += 1
+                except Exception as e:
+                    results['failed'] += 1
+                    results['errors'].append(f"第{index+2}行: {str(e)}")
+            self._commit_chunk(results, df, success_before, progress)
+        ref_cache.invalidate(SysDept)
         return results
 
     # --- 3. 商品导入 ---
-    def process_product_import(self, file_contents: bytes):
-        df = self._read_excel(file_contents)
+    def process_product_import(self, source: ImportSource, filename: Optional[str] = None, progress: Optional[ProgressCallback] = None):
         column_map = {'商品名称': 'product_name', '商品编码': 'product_code'}
-        df.rename(columns=column_map, inplace=True)
-        results = {"total": len(df), "success": 0, "failed": 0, "errors": []}
+        results = {"total": 0, "success": 0, "failed": 0, "errors": []}
         
-        for index, row in df.iterrows():
-            try:
-                name = row.get('product_name')
-                code = row.get('product_code')
-                if not name: continue
-                if code and self.db.query(CrmProduct).filter(CrmProduct.product_code == code).first(): continue
-                prod = CrmProduct(product_name=name, product_code=code, status=1)
-                self.db.add(prod)
-                results['success'] += 1
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"第{index+2}行: {str(e)}")
-        self.db.commit()
+        for df in self._iter_chunks(source, column_map, filename):
+            results['total'] += len(df)
+            success_before = results['success']
+            for index, row in zip(df.index, df.to_dict('records')):
+                try:
+                    name = row.get('product_name')
+                    code = row.get('product_code')
+                    if not name: continue
+                    if code and self.db.query(CrmProduct).filter(CrmProduct.product_code == code).first(): continue
+                    prod = CrmProduct(product_name=name, product_code=code, status=1)
+                    self.db.add(prod)
+                    results['success'] += 1
+                except Exception as e:
+                    results['failed'] += 1
+                    results['errors'].append(f"第{index+2}行: {str(e)}")
+            self._commit_chunk(results, df, success_before, progress)
+        ref_cache.invalidate(CrmProduct)
         return results
 
     # --- 4. 用户导入 ---
-    def process_user_import(self, file_contents: bytes):
-        df = self._read_excel(file_contents)
+    def process_user_import(self, source: ImportSource, filename: Optional[str] = None, progress: Optional[ProgressCallback] = None):
         column_map = {'用户名称': 'username', '手机号': 'phone', '密码': 'password', '门店': 'dept_name', '角色': 'role_name', '岗位': 'post'}
-        df.rename(columns=column_map, inplace=True)
-        results = {"total": len(df), "success": 0, "failed": 0, "errors": []}
+        results = {"total": 0, "success": 0, "failed": 0, "skipped": 0, "errors": []}
+        seen_usernames: Set[str] = set()
         
-        for index, row in df.iterrows():
-            try:
-                username = row.get('username')
-                if not username: continue
-                if self.db.query(SysUser).filter(SysUser.username == username).first(): continue
-                
-                dept_id = None
-                if row.get('dept_name'):
-                    dept = self.db.query(SysDept).filter(SysDept.dept_name == row.get('dept_name')).first()
-                    if dept: dept_id = dept.id
-                role_id = None
-                if row.get('role_name'):
-                    role = self.db.query(SysRole).filter(SysRole.role_name == row.get('role_name')).first()
-                    if role: role_id = role.id
-                
-                pwd = str(row.get('password') or '123456')
-                user = SysUser(username=username, password=get_password_hash(pwd), phone=row.get('phone'), dept_id=dept_id, role_id=role_id, post=row.get('post'), status=1)
-                self.db.add(user)
-                results['success'] += 1
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"第{index+2}行: {str(e)}")
-        self.db.commit()
+        for df in self._iter_chunks(source, column_map, filename):
+            results['total'] += len(df)
+            success_before = results['success']
+            records = [(index, row) for index, row in zip(df.index, df.to_dict('records')) if row.get('username')]
+            
+            # 1. 先剔除文件内重复及库中已存在的用户名，避免为它们计算密码哈希
+            existing = self._existing_values(SysUser.username, [row['username'] for _, row in records])
+            pending = []
+            for index, row in records:
+                if row['username'] in existing or row['username'] in seen_usernames:
+                    results['skipped'] += 1
+                    continue
+                seen_usernames.add(row['username'])
+                pending.append((index, row))
+            
+            # 2. 门店、角色名称批量转 ID
+            dept_ids = self._name_map(SysDept.dept_name, SysDept.id, [row.get('dept_name') for _, row in pending])
+            role_ids = self._name_map(SysRole.role_name, SysRole.id, [row.get('role_name') for _, row in pending])
+            
+            # 3. 多进程并行计算密码哈希
+            hashes = hash_passwords([str(row.get('password') or '123456') for _, row in pending])
+            
+            for (index, row), hashed_pwd in zip(pending, hashes):
+                try:
+                    user = SysUser(
+                        username=row['username'],
+                        password=hashed_pwd,
+                        phone=row.get('phone'),
+                        dept_id=dept_ids.get(row.get('dept_name')),
+                        role_id=role_ids.get(row.get('role_name')),
+                        post=row.get('post'),
+                        status=1
+                    )
+                    self.db.add(user)
+                    results['success'] += 1
+                except Exception as e:
+                    results['failed'] += 1
+                    results['errors'].append(f"第{index+2}行: {str(e)}")
+            self._commit_chunk(results, df, success_before, progress)
+        ref_cache.invalidate(SysUser)
         return results
 
     # --- 5. 分配规则导入 (核心更新) ---
-    def process_allocation_import(self, file_contents: bytes):
-        df = self._read_excel(file_contents)
+    def process_allocation_import(self, source: ImportSource, filename: Optional[str] = None, progress: Optional[ProgressCallback] = None):
         # 映射需求文档中的列名
         column_map = {
             '天淘省': 'tiantao_province', 
@@ -173,41 +392,44 @@ class ImportService:
             '店长': 'leader_name',
             '店长名称': 'leader_name'
         }
-        df.rename(columns=column_map, inplace=True)
-        results = {"total": len(df), "success": 0, "failed": 0, "errors": []}
+        results = {"total": 0, "success": 0, "failed": 0, "errors": []}
         
-        for index, row in df.iterrows():
-            try:
-                # 必须匹配到门店
-                target_dept_id = None
-                target_leader_id = None
+        for df in self._iter_chunks(source, column_map, filename):
+            results['total'] += len(df)
+            success_before = results['success']
+            for index, row in zip(df.index, df.to_dict('records')):
+                try:
+                    # 必须匹配到门店
+                    target_dept_id = None
+                    target_leader_id = None
                 
-                dept_name = row.get('dept_name')
-                if dept_name:
-                    dept = self.db.query(SysDept).filter(SysDept.dept_name == dept_name).first()
-                    if dept: target_dept_id = dept.id
+                    dept_name = row.get('dept_name')
+                    if dept_name:
+                        dept = self.db.query(SysDept).filter(SysDept.dept_name == dept_name).first()
+                        if dept: target_dept_id = dept.id
                 
-                if not target_dept_id:
-                    raise Exception(f"找不到门店: {dept_name}")
+                    if not target_dept_id:
+                        raise Exception(f"找不到门店: {dept_name}")
                 
-                leader_name = row.get('leader_name')
-                if leader_name:
-                    user = self.db.query(SysUser).filter(SysUser.username == leader_name).first()
-                    if user: target_leader_id = user.id
+                    leader_name = row.get('leader_name')
+                    if leader_name:
+                        user = self.db.query(SysUser).filter(SysUser.username == leader_name).first()
+                        if user: target_leader_id = user.id
                 
-                rule = SysRegionAllocation(
-                    tiantao_province=row.get('tiantao_province'),
-                    tiantao_city=row.get('tiantao_city'),
-                    douyin_province=row.get('douyin_province'),
-                    douyin_city=row.get('douyin_city'),
-                    douyin_province_city=row.get('douyin_province_city'),
-                    target_dept_id=target_dept_id,
-                    target_leader_id=target_leader_id
-                )
-                self.db.add(rule)
-                results['success'] += 1
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append(f"第{index+2}行: {str(e)}")
-        self.db.commit()
+                    rule = SysRegionAllocation(
+                        tiantao_province=row.get('tiantao_province'),
+                        tiantao_city=row.get('tiantao_city'),
+                        douyin_province=row.get('douyin_province'),
+                        douyin_city=row.get('douyin_city'),
+                        douyin_province_city=row.get('douyin_province_city'),
+                        target_dept_id=target_dept_id,
+                        target_leader_id=target_leader_id
+                    )
+                    self.db.add(rule)
+                    results['success'] += 1
+                except Exception as e:
+                    results['failed'] += 1
+                    results['errors'].append(f"第{index+2}行: {str(e)}")
+            self._commit_chunk(results, df, success_before, progress)
+        invalidate_region_matcher()
         return results
\ No newline at end of file
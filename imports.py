@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+from app.services.import_jobs import import_jobs
+
+router = APIRouter()
+
+# --- 1. 查询导入任务进度 ---
+@router.get("/{job_id}")
+def get_import_job(job_id: str):
+    job = import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    return job.to_dict()
+
+# --- 2. 下载导入结果 (任务进行中时为部分结果) ---
+@router.get("/{job_id}/report")
+def download_import_report(job_id: str):
+    job = import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="导入任务不存在或已过期")
+    # 带 BOM 方便 Excel 直接打开中文
+    content = "﻿" + job.report_csv()
+    return Response(
+        content=content.encode("utf-8"),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="import_{job_id}.csv"'}
+    )
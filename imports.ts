@@ -0,0 +1,23 @@
+import request from '@/utils/request'
+
+// 查询导入任务进度
+// 返回 { job_id, status, processed, success, skipped, failed, estimated_total, eta_seconds, ... }
+export const getImportJob = (jobId: string) => {
+  return request({
+    url: `/imports/${jobId}`,
+    method: 'get'
+  })
+}
+
+// 导入结果报告下载地址 (任务进行中时为部分结果)
+export const getImportReportUrl = (jobId: string) => `/api/imports/${jobId}/report`
+
+// 轮询直到任务结束，onProgress 用于刷新进度条
+export const waitImportJob = async (jobId: string, onProgress?: (job: any) => void, interval = 1000) => {
+  while (true) {
+    const job: any = await getImportJob(jobId)
+    onProgress?.(job)
+    if (job.status === 'success' || job.status === 'failed') return job
+    await new Promise((resolve) => setTimeout(resolve, interval))
+  }
+}
@@ -0,0 +1,89 @@
+# backend/app/core/index_advisor.py
+from typing import Callable, List, Tuple
+from sqlalchemy import func, text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+from app.models import (
+    CrmCustomer, CrmFollowRecord, CrmOrder, SysOperationLog, SysUser, SysRegionAllocation, RptDailyStat
+)
+
+# 小表允许全表扫描 (基础资料、规则表)
+SMALL_TABLES = {"sys_region_allocation", "sys_dept", "sys_role", "crm_product"}
+
+# (名称, 所属接口, 构造查询的函数)；参数取任意代表值即可，EXPLAIN 只看执行计划
+QueryCase = Tuple[str, str, Callable[[Session], object]]
+
+QUERY_CASES: List[QueryCase] = [
+    ("customer_list_admin", "GET /api/customers/page",
+     lambda db: db.query(CrmCustomer).order_by(CrmCustomer.create_time.desc(), CrmCustomer.id.desc()).limit(50)),
+    ("customer_list_dept", "GET /api/customers/page",
+     lambda db: db.query(CrmCustomer).filter(CrmCustomer.dept_id == 1)
+        .order_by(CrmCustomer.create_time.desc(), CrmCustomer.id.desc()).limit(50)),
+    ("customer_list_owner", "GET /api/customers/page",
+     lambda db: db.query(CrmCustomer).filter(CrmCustomer.dept_id == 1, CrmCustomer.owner_id == 1)
+        .order_by(CrmCustomer.create_time.desc(), CrmCustomer.id.desc()).limit(50)),
+    ("customer_by_phone", "POST /api/customers/",
+     lambda db: db.query(CrmCustomer).filter(CrmCustomer.phone == "13800000000")),
+    ("customer_follows", "GET /api/customers/{id}/follows",
+     lambda db: db.query(CrmFollowRecord).filter(CrmFollowRecord.customer_id == 1)
+        .order_by(CrmFollowRecord.create_time.desc())),
+    ("customer_logs", "GET /api/customers/{id}/logs",
+     lambda db: db.query(SysOperationLog).filter(SysOperationLog.ref_id == 1)
+        .order_by(SysOperationLog.create_time.desc())),
+    ("efficiency_assign_time", "GET /api/report/efficiency",
+     lambda db: db.query(SysOperationLog.ref_id, func.max(SysOperationLog.create_time))
+        .filter(SysOperationLog.ref_id.in_([1, 2, 3]), SysOperationLog.action_type == "转移客户")
+        .group_by(SysOperationLog.ref_id)),
+    ("efficiency_first_follow", "GET /api/report/efficiency",
+     lambda db: db.query(CrmFollowRecord.customer_id, func.min(CrmFollowRecord.create_time))
+        .filter(CrmFollowRecord.customer_id.in_([1, 2, 3])).group_by(CrmFollowRecord.customer_id)),
+    ("order_list", "GET /api/orders/",
+     lambda db: db.query(CrmOrder).filter(CrmOrder.customer_id == 1).order_by(CrmOrder.create_time.desc())),
+    ("user_by_username", "GET 当前用户校验",
+     lambda db: db.query(SysUser).filter(SysUser.username == "admin")),
+    ("allocation_rules", "AllocationService.auto_allocate",
+     lambda db: db.query(SysRegionAllocation).order_by(SysRegionAllocation.create_time.desc())),
+    ("summary_today", "GET /api/report/summary",
+     lambda db: db.query(func.sum(RptDailyStat.new_count)).filter(RptDailyStat.stat_date == func.curdate())),
+]
+
+def _compile(query) -> str:
+    return str(query.statement.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+def explain_all(db: Session) -> List[dict]:
+    """
+    对各接口的主要查询执行 EXPLAIN，标记全表扫描与文件排序
+    :return: 每个查询一条结果，problems 为空表示执行计划正常
+    """
+    report = []
+    for name, endpoint, build in QUERY_CASES:
+        item = {"name": name, "endpoint": endpoint, "plan": [], "problems": []}
+        try:
+            sql = _compile(build(db))
+            item["sql"] = sql
+            rows = [dict(r) for r in db.execute(text("EXPLAIN " + sql)).mappings().all()]
+            item["plan"] = rows
+            for r in rows:
+                table = r.get("table")
+                extra = r.get("Extra") or ""
+                if r.get("type") == "ALL" and table not in SMALL_TABLES:
+                    item["problems"].append(f"全表扫描: {table} (约 {r.get('rows')} 行)")
+                if "Using filesort" in extra and table not in SMALL_TABLES:
+                    item["problems"].append(f"文件排序: {table}")
+        except Exception as e:
+            item["problems"].append(f"EXPLAIN 失败: {str(e)}")
+        report.append(item)
+    return report
+
+# 命令行执行: python -m app.core.index_advisor
+if __name__ == "__main__":
+    from app.database import SessionLocal
+    session = SessionLocal()
+    try:
+        for item in explain_all(session):
+            flag = "❌" if item["problems"] else "✅"
+            print(f"{flag} {item['name']:<28} {item['endpoint']}")
+            for p in item["problems"]:
+                print(f"    - {p}")
+    finally:
+        session.close()
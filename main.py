@@ -1,15 +1,30 @@
 import os
+import asyncio
 import uvicorn
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException
+from typing import List
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html, get_swagger_ui_oauth2_redirect_html
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 # 导入内部模块
 from app.database import engine, Base, get_db, SessionLocal
 from app.services.import_service import ImportService
-from app.core.file_storage import FileStorage
-from app.core.security import get_password_hash
+from app.services.import_jobs import import_jobs
+from app.services.stats_service import rebuild_daily_stats
+from app.services.file_index import register_file
+from app.services.ai_client import ai_gateway
+from app.services.ai_batch import ai_batch_jobs
+from app.core.file_storage import upload_storage, UploadError, StoredFile, variant_url
+from app.core.file_serving import serve_file
+from app.core.security import get_password_hash, shutdown_hash_pool
+from app.core.ref_cache import ref_cache
+from app.core.principal import Principal, principal_cache, get_admin_principal
+from app.core.oplog import oplog_writer
+from app.core.db_migrate import ensure_columns, ensure_indexes
+from app.core.index_advisor import explain_all
 import app.models as models
 
 # --- 导入所有 API 模块 ---
@@ -23,9 +38,16 @@ from app.api import allocation
 from app.api import order
 from app.api import ai
 from app.api import report  # ✅ 核心修复：导入报表模块
+from app.api import imports
 
 # --- 1. 初始化数据库表 ---
 models.Base.metadata.create_all(bind=engine)
+# 老库补建字段与索引 (create_all 不会修改已存在的表)
+try:
+    ensure_columns(engine)
+    ensure_indexes(engine)
+except Exception as e:
+    print(f">>> [系统初始化] 索引迁移失败: {str(e)}")
 
 # --- 2. 初始化 FastAPI 应用 ---
 app = FastAPI(
@@ -57,6 +79,7 @@ app.include_router(allocation.router, prefix="/api/allocations", tags=["客资
 app.include_router(order.router, prefix="/api/orders", tags=["订单管理"])
 app.include_router(ai.router, prefix="/api/ai", tags=["AI助手"])
 app.include_router(report.router, prefix="/api/report", tags=["数据报表"]) # ✅ 核心修复：注册报表路由
+app.include_router(imports.router, prefix="/api/imports", tags=["导入任务"])
 
 # --- 5. 启动事件: 创建默认管理员 ---
 @app.on_event("startup")
@@ -90,6 +113,43 @@ def create_or_reset_admin():
     finally:
         db.close()
 
+# --- 5.1 启动事件: 每日统计表为空时自动回填 ---
+# 多个 worker 同时启动时只由拿到锁的一个回填，其它直接跳过 (锁挂在单独的连接上，回填提交不影响持有)
+DAILY_STATS_INIT_LOCK = "scrm_init_daily_stats"
+
+@app.on_event("startup")
+def init_daily_stats():
+    with engine.connect() as lock_conn:
+        if not lock_conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": DAILY_STATS_INIT_LOCK}).scalar():
+            return
+        db = SessionLocal()
+        try:
+            if not db.query(models.RptDailyStat.id).first() and db.query(models.CrmCustomer.id).first():
+                print(">>> [系统初始化] 正在回填每日统计表...")
+                rebuild_daily_stats(db)
+        except Exception as e:
+            print(f">>> [系统初始化] 每日统计回填失败: {str(e)}")
+        finally:
+            db.close()
+            lock_conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": DAILY_STATS_INIT_LOCK})
+
+# --- 5.2 关闭事件: 等待后台导入任务结束、刷新操作日志 ---
+@app.on_event("shutdown")
+def shutdown_import_jobs():
+    import_jobs.shutdown()
+    # 导入任务结束后再关闭批量密码哈希的进程池
+    shutdown_hash_pool()
+    # 写完队列中剩余的操作日志
+    oplog_writer.shutdown()
+    # 等待排队中的缩略图生成完
+    upload_storage.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_ai_gateway():
+    # 取消未完成的批量话术任务，再关闭 AI 服务商连接池
+    ai_batch_jobs.shutdown()
+    await ai_gateway.close()
+
 # --- 6. 文档与静态资源 ---
 @app.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
@@ -110,26 +170,94 @@ async def swagger_ui_redirect():
 def read_root():
     return {"message": "SCRM System is running!", "status": "active"}
 
+# 基础资料缓存命中统计
+@app.get("/api/cache/stats")
+def get_cache_stats(principal: Principal = Depends(get_admin_principal)):
+    return {**ref_cache.stats(), "principal": principal_cache.stats()}
+
+# 索引诊断: 对主要查询执行 EXPLAIN，标记全表扫描
+@app.get("/api/diag/explain")
+def get_explain_report(principal: Principal = Depends(get_admin_principal), db: Session = Depends(get_db)):
+    return explain_all(db)
+
+# 图片上传: 分块写盘在线程池中执行，不阻塞事件循环
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "9"))
+
+def _image_url(filename: str) -> str:
+    base_url = os.getenv("IMG_BASE_URL", "")
+    if base_url:
+        return f"{base_url.rstrip('/')}/{filename}"
+    return f"/uploads/{filename}"
+
+def _register_upload(stored: StoredFile) -> None:
+    # 登记到文件索引 (刷新 last_upload_time，清理任务不会删除刚上传的文件)；登记失败时上传失败
+    db = SessionLocal()
+    try:
+        register_file(db, stored)
+        db.commit()
+    finally:
+        db.close()
+
+def _store_upload(file: UploadFile) -> StoredFile:
+    stored = upload_storage.save_stream(file.file, file.content_type, register=_register_upload)
+    # 缩略图由后台线程生成，不延长上传耗时
+    upload_storage.schedule_variants(stored.filename)
+    return stored
+
+def _upload_result(stored: StoredFile) -> dict:
+    url = _image_url(stored.filename)
+    return {
+        "url": url,
+        "filename": stored.filename,
+        "thumb_url": variant_url(url, "thumb"),
+        "preview_url": variant_url(url, "preview"),
+    }
+
+async def _save_upload(file: UploadFile) -> StoredFile:
+    try:
+        return await run_in_threadpool(_store_upload, file)
+    finally:
+        await file.close()
+
 # 图片上传接口
 @app.post("/api/upload/image")
 async def upload_image(file: UploadFile = File(...)):
-    upload_dir = os.getenv("UPLOAD_DIR", "/app/uploads")
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-        
-    base_url = os.getenv("IMG_BASE_URL", "") 
-    storage = FileStorage(upload_dir)
     try:
-        file_content = await file.read()
-        new_filename = storage.save_file(file_content, file.filename)
+        stored = await _save_upload(file)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-    full_url = f"/uploads/{new_filename}"
-    if base_url:
-        full_url = f"{base_url.rstrip('/')}/{new_filename}"
-        
-    return {"code": 200, "message": "上传成功", "url": full_url, "filename": new_filename}
+    return {"code": 200, "message": "上传成功", **_upload_result(stored)}
+
+# 多图上传 (订单照片)，各文件并行写盘，单个失败不影响其它文件
+@app.post("/api/upload/images")
+async def upload_images(files: List[UploadFile] = File(...)):
+    if len(files) > UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"一次最多上传 {UPLOAD_MAX_FILES} 张图片")
+    results = await asyncio.gather(*[_save_upload(f) for f in files], return_exceptions=True)
+    items = []
+    for file, result in zip(files, results):
+        if isinstance(result, UploadError):
+            items.append({"original": file.filename, "error": result.detail})
+        elif isinstance(result, Exception):
+            items.append({"original": file.filename, "error": str(result)})
+        else:
+            items.append({"original": file.filename, **_upload_result(result)})
+    failed = sum(1 for i in items if "error" in i)
+    return {"code": 200, "message": f"上传成功 {len(items) - failed} 张，失败 {failed} 张", "items": items}
+
+# 上传文件访问 (Nginx /uploads/ 转发到这里)；缩略图缺失时按需生成
+# 支持 ETag / Range / 长期缓存，配置 UPLOAD_ACCEL_PREFIX 后交给 Nginx 发送
+@app.api_route("/uploads/{filename:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def get_upload_file(filename: str, request: Request):
+    try:
+        path = upload_storage.resolve(filename)
+    except ValueError:
+        path = None
+    if not path:
+        raise HTTPException(status_code=404, detail="文件不存在")
+    return serve_file(request, filename, path)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, DECIMAL, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Text, DECIMAL, JSON, UniqueConstraint, Index, Computed
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -51,9 +51,21 @@ class SysRegionAllocation(Base):
 # --- 5. 客户表 (包含所有扩展字段) ---
 class CrmCustomer(Base):
     __tablename__ = "crm_customer"
+    __table_args__ = (
+        # 客户列表: 按门店 (店长) / 门店+跟进人 (销售) 过滤，按 (create_time, id) 倒序分页
+        Index("idx_customer_dept_owner_time", "dept_id", "owner_id", "create_time"),
+        Index("idx_customer_dept_time_id", "dept_id", "create_time", "id"),
+        Index("idx_customer_time_id", "create_time", "id"),
+        # 搜索: 姓名前缀、手机号后缀 (倒序手机号前缀)、姓名/小区/地址 ngram 全文检索
+        Index("idx_customer_name", "customer_name"),
+        Index("idx_customer_phone_rev", "phone_rev"),
+        Index("ft_customer_text", "customer_name", "community", "address",
+              mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     customer_name = Column(String(50))
     phone = Column(String(20), unique=True, nullable=False) 
+    phone_rev = Column(String(20), Computed("reverse(phone)", persisted=True))  # 倒序手机号 (生成列)，用于尾号搜索
     source = Column(String(50)) 
     address = Column(String(255)) 
     
@@ -95,6 +107,10 @@ class CrmProduct(Base):
 # --- 7. 操作日志表 ---
 class SysOperationLog(Base):
     __tablename__ = "sys_operation_log"
+    __table_args__ = (
+        # 客户日志: 按 ref_id 过滤、按时间倒序 (分配时间统计的 action_type 条件在索引范围内回表过滤)
+        Index("idx_log_ref_time", "ref_id", "create_time"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     ref_id = Column(Integer, nullable=False) 
     ref_type = Column(String(20), default='CUSTOMER') 
@@ -106,6 +122,9 @@ class SysOperationLog(Base):
 # --- 8. 跟进记录表 ---
 class CrmFollowRecord(Base):
     __tablename__ = "crm_follow_record"
+    __table_args__ = (
+        Index("idx_follow_customer_time", "customer_id", "create_time"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, nullable=False)
     follow_detail = Column(Text)
@@ -117,12 +136,16 @@ class CrmFollowRecord(Base):
 # --- 9. 订单表 ---
 class CrmOrder(Base):
     __tablename__ = "crm_order"
+    __table_args__ = (
+        Index("idx_order_customer_time", "customer_id", "create_time"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, nullable=False)
     order_no = Column(String(50), nullable=False)
     product_id = Column(Integer)
     amount = Column(DECIMAL(10, 2))
-    order_image_url = Column(String(500)) 
+    # 订单照片 URL，多张以逗号分隔 (内容寻址 URL 约 110 字符，需容纳 UPLOAD_MAX_FILES 张)
+    order_image_url = Column(String(2000))
     transaction_type = Column(String(50))
     is_cash_back = Column(Integer, default=0)
     cash_back_amount = Column(DECIMAL(10, 2))
@@ -131,4 +154,48 @@ class CrmOrder(Base):
     is_trade_in = Column(Integer, default=0)
     trade_in_no = Column(String(50))
     maker_id = Column(Integer)
-    create_time = Column(DateTime, default=func.now())
\ No newline at end of file
+    create_time = Column(DateTime, default=func.now())
+
+# --- 10. 每日统计汇总表 (按 日期 + 门店 + 来源 预聚合，供首页看板使用) ---
+class RptDailyStat(Base):
+    __tablename__ = "rpt_daily_stat"
+    __table_args__ = (UniqueConstraint("stat_date", "dept_id", "source", name="uk_daily_stat"),)
+    id = Column(Integer, primary_key=True, index=True)
+    stat_date = Column(Date, nullable=False)
+    dept_id = Column(Integer, nullable=False, default=0)       # 0 表示未分配门店
+    source = Column(String(50), nullable=False, default='')    # 空串表示未知来源
+    new_count = Column(Integer, nullable=False, default=0)     # 新增客资
+    deal_count = Column(Integer, nullable=False, default=0)    # 成交客户
+    follow_count = Column(Integer, nullable=False, default=0)  # 跟进次数
+
+# --- 11. AI 话术表 (批量生成的跟进话术，按客户保存) ---
+class CrmAiScript(Base):
+    __tablename__ = "crm_ai_script"
+    __table_args__ = (
+        # 客户详情: 按客户取最近话术；任务结果: 按任务取
+        Index("idx_ai_script_customer_time", "customer_id", "create_time"),
+        Index("idx_ai_script_job", "job_id"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, nullable=False)
+    job_id = Column(String(32))
+    prompt_hash = Column(String(64))                # 相同提示词的客户共用一次生成结果
+    content = Column(Text)
+    status = Column(String(20), default='success')  # success / failed
+    error = Column(String(255))
+    create_user_id = Column(Integer)
+    create_time = Column(DateTime, default=func.now())
+
+# --- 12. 上传文件索引 (内容寻址存储的引用索引，供清理未被订单引用的图片) ---
+class SysFileObject(Base):
+    __tablename__ = "sys_file_object"
+    __table_args__ = (
+        # 清理: 按最近上传时间筛选超过保护期的文件
+        Index("idx_file_last_upload", "last_upload_time"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    filename = Column(String(255), unique=True, nullable=False)  # 相对上传目录的路径，如 ab/cd/<sha256>.jpg
+    size = Column(Integer)
+    content_type = Column(String(50))
+    create_time = Column(DateTime, default=func.now())
+    last_upload_time = Column(DateTime, default=func.now())     # 重复上传相同内容时刷新
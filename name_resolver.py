@@ -0,0 +1,50 @@
+# backend/app/core/name_resolver.py
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from app.models import SysDept, SysUser, SysRole, CrmProduct
+from app.core.ref_cache import ref_cache
+
+# 实体类型 -> (模型, 名称字段)
+NAME_FIELDS = {
+    "dept": (SysDept, SysDept.dept_name),
+    "user": (SysUser, SysUser.username),
+    "role": (SysRole, SysRole.role_name),
+    "product": (CrmProduct, CrmProduct.product_name),
+}
+
+class NameResolver:
+    """
+    列表接口的名称批量解析
+    先收集一页数据中的全部 ID，每种实体只发一条 IN (...) 查询 (基础资料缓存命中时不查库)；
+    已解析过的 ID 保存在本对象中 (按请求的 identity map)，不会重复查询。
+    """
+    def __init__(self, db: Session):
+        self.db = db
+        self._names: Dict[str, Dict[int, Optional[str]]] = {kind: {} for kind in NAME_FIELDS}
+
+    def prefetch(self, **ids_by_kind: Iterable[Optional[int]]) -> "NameResolver":
+        """
+        批量加载名称
+        :param ids_by_kind: 如 dept=[1, 2], user=[3]
+        """
+        for kind, ids in ids_by_kind.items():
+            model, name_col = NAME_FIELDS[kind]
+            known = self._names[kind]
+            missing = {i for i in ids if i and i not in known}
+            if not missing:
+                continue
+            rows = ref_cache.get_many(self.db, model, missing)
+            for row_id, row in rows.items():
+                known[row_id] = getattr(row, name_col.key)
+            # 不存在的 ID 也记下来，避免再次查询
+            for i in missing:
+                known.setdefault(i, None)
+        return self
+
+    def name(self, kind: str, id: Optional[int]) -> Optional[str]:
+        if not id:
+            return None
+        if id not in self._names[kind]:
+            self.prefetch(**{kind: [id]})
+        return self._names[kind][id]
+
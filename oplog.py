@@ -0,0 +1,121 @@
+# backend/app/core/oplog.py
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import SysOperationLog
+
+# 配置: 写入模式 session (随业务事务提交，默认) / async (后台批量写入)
+OPLOG_MODE = os.getenv("OPLOG_MODE", "session")
+# 后台批量写入: 每批最大条数、最长等待时间(秒)
+OPLOG_BATCH_SIZE = int(os.getenv("OPLOG_BATCH_SIZE", "200"))
+OPLOG_FLUSH_INTERVAL = float(os.getenv("OPLOG_FLUSH_INTERVAL", "1.0"))
+
+class OperationLogWriter:
+    """
+    操作日志后台批量写入器
+    日志先进入内存队列，达到条数或时间阈值后用一条多行 INSERT 写入；
+    关闭时会把队列中剩余的日志全部写完。
+    """
+    _STOP = object()
+
+    def __init__(self, batch_size: int = OPLOG_BATCH_SIZE, interval: float = OPLOG_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="oplog-writer", daemon=True)
+                self._thread.start()
+
+    def put(self, row: dict) -> None:
+        self.start()
+        self._queue.put(row)
+
+    def shutdown(self, timeout: float = 10) -> None:
+        with self._lock:
+            thread = self._thread
+        if thread and thread.is_alive():
+            self._queue.put(self._STOP)
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        buf: List[dict] = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is self._STOP:
+                self._flush(buf)
+                return
+            if item is not None:
+                buf.append(item)
+            if len(buf) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(buf)
+                buf = []
+                deadline = time.monotonic() + self.interval
+
+    def _flush(self, rows: List[dict]) -> None:
+        if not rows:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(SysOperationLog.__table__.insert(), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f">>> [操作日志] 批量写入失败，丢弃 {len(rows)} 条: {str(e)}")
+        finally:
+            db.close()
+
+# 全局单例
+oplog_writer = OperationLogWriter()
+
+# async 模式下等待业务事务提交的日志，挂在 session.info 上
+_PENDING_KEY = "oplog_pending"
+
+@event.listens_for(Session, "after_commit")
+def _queue_pending_logs(session: Session) -> None:
+    for row in session.info.pop(_PENDING_KEY, []):
+        oplog_writer.put(row)
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_pending_logs(session: Session, transaction) -> None:
+    # 最外层事务回滚 / 未提交就关闭时，丢弃未提交业务的日志
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+def add_log(db: Session, ref_id: int, operator: str, action: str, content: str, ref_type: str = "CUSTOMER") -> None:
+    """
+    记录操作日志
+    默认加入调用方的事务 (不提交)，由业务代码统一 commit；
+    OPLOG_MODE=async 时在调用方事务提交后交给后台批量写入器，事务回滚则不记录。
+    """
+    if OPLOG_MODE == "async":
+        db.info.setdefault(_PENDING_KEY, []).append({
+            "ref_id": ref_id,
+            "ref_type": ref_type,
+            "operator_name": operator,
+            "action_type": action,
+            "content": content,
+            "create_time": datetime.now(),
+        })
+        return
+    db.add(SysOperationLog(
+        ref_id=ref_id,
+        ref_type=ref_type,
+        operator_name=operator,
+        action_type=action,
+        content=content
+    ))
@@ -1,30 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
+from datetime import datetime
 from app.database import get_db
-from app.models import CrmOrder, CrmProduct, SysUser, CrmCustomer
+from app.models import CrmOrder, CrmCustomer
+from app.core.name_resolver import NameResolver
+from app.services.stats_service import bump_daily_stat
 from app.schemas import OrderCreate, OrderUpdate, OrderResponse
+from app.core.file_storage import variant_url
 
 router = APIRouter()
 
+# --- 辅助函数: 填充订单照片的缩略图 / 预览图地址 ---
+def fill_image_variants(res: OrderResponse) -> OrderResponse:
+    res.order_image_thumb_url = variant_url(res.order_image_url, "thumb")
+    res.order_image_preview_url = variant_url(res.order_image_url, "preview")
+    return res
+
 @router.get("/", response_model=List[OrderResponse])
 def get_orders(customer_id: int, db: Session = Depends(get_db)):
     # 订单通常是依附于客户的，所以必传 customer_id
     query = db.query(CrmOrder).filter(CrmOrder.customer_id == customer_id)
     orders = query.order_by(CrmOrder.create_time.desc()).all()
     
+    # 批量解析商品名、做单人
+    resolver = NameResolver(db).prefetch(
+        product=[o.product_id for o in orders],
+        user=[o.maker_id for o in orders]
+    )
     result = []
     for o in orders:
         res = OrderResponse.from_orm(o)
-        # 填充商品名
-        if o.product_id:
-            p = db.query(CrmProduct).filter(CrmProduct.id == o.product_id).first()
-            if p: res.product_name = p.product_name
-        # 填充做单人
-        if o.maker_id:
-            u = db.query(SysUser).filter(SysUser.id == o.maker_id).first()
-            if u: res.maker_name = u.username
-        result.append(res)
+        res.product_name = resolver.name("product", o.product_id)
+        res.maker_name = resolver.name("user", o.maker_id)
+        result.append(fill_image_variants(res))
     return result
 
 @router.post("/", response_model=OrderResponse)
@@ -37,14 +46,18 @@ def create_order(item: OrderCreate, db: Session = Depends(get_db)):
     db_order = CrmOrder(**item.dict())
     db.add(db_order)
     
+    # 首次成交记录成交时间并计入当天的每日统计 (订单的 create_time 在 flush 前还没有值)
+    if cust.is_deal != 1:
+        cust.deal_time = datetime.now()
+        bump_daily_stat(db, cust.dept_id, cust.source, deal=1, day=cust.deal_time.date())
+    
     # 自动更新客户状态为“已成交”
     cust.is_deal = 1
     cust.follow_status = "已成交"
-    cust.deal_time = db_order.create_time
     
     db.commit()
     db.refresh(db_order)
-    return db_order
+    return fill_image_variants(OrderResponse.from_orm(db_order))
 
 @router.delete("/{id}")
 def delete_order(id: int, db: Session = Depends(get_db)):
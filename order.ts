@@ -21,4 +21,15 @@ export const deleteOrder = (id: number) => {
     url: `/orders/${id}`,
     method: 'delete'
   })
-}
\ No newline at end of file
+}
+// 上传订单照片 (多张并行保存)，返回每张图片的 url 或错误信息
+export const uploadOrderImages = (files: File[]) => {
+  const formData = new FormData()
+  files.forEach((file) => formData.append('files', file))
+  return request({
+    url: '/upload/images',
+    method: 'post',
+    data: formData,
+    timeout: 120000
+  })
+}
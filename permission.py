@@ -0,0 +1,86 @@
+# backend/app/core/permission.py
+import threading
+from typing import Dict, FrozenSet, Optional, Tuple
+from app.models import CrmCustomer
+
+# 数据范围
+SCOPE_ALL = "all"    # 全部客户
+SCOPE_DEPT = "dept"  # 本门店客户
+SCOPE_SELF = "self"  # 本人跟进的客户
+
+# 角色 permissions 中可显式声明的数据范围
+SCOPE_PERMISSIONS = {"scope:all": SCOPE_ALL, "scope:dept": SCOPE_DEPT, "scope:self": SCOPE_SELF}
+
+class CompiledRole:
+    """
+    编译后的角色权限
+    permissions JSON 在编译时转为 frozenset，之后的权限判断都是集合查找；
+    管理员 / 店长 的识别兼容原有按角色名称、编码匹配的规则。
+    """
+    def __init__(self, role):
+        raw = (role.permissions if role else None) or []
+        self.permissions: FrozenSet[str] = frozenset(p for p in raw if isinstance(p, str))
+        role_name = (role.role_name or '') if role else ''
+        role_code = (role.role_code or '') if role else ''
+        self.is_admin = (
+            '*' in self.permissions
+            or '管理员' in role_name
+            or 'admin' in role_code.lower()
+        )
+        self.is_leader = '店长' in role_name
+        self.declared_scope: Optional[str] = next(
+            (SCOPE_PERMISSIONS[p] for p in ('scope:all', 'scope:dept', 'scope:self') if p in self.permissions),
+            None
+        )
+
+# (角色ID, 角色表版本号) -> CompiledRole
+_compiled: Dict[Tuple[Optional[int], int], CompiledRole] = {}
+_lock = threading.Lock()
+
+def compile_role(role, version: int) -> CompiledRole:
+    """按角色版本缓存编译结果，角色修改后版本号变化自动重新编译"""
+    key = (role.id if role else None, version)
+    with _lock:
+        compiled = _compiled.get(key)
+        if compiled is None:
+            # 丢弃旧版本的编译结果
+            for k in [k for k in _compiled if k[1] != version]:
+                del _compiled[k]
+            compiled = _compiled[key] = CompiledRole(role)
+        return compiled
+
+class AccessPolicy:
+    """
+    当前登录人的权限与数据范围 (随登录态一起缓存，请求内不再查库)
+    """
+    def __init__(self, compiled: CompiledRole, user):
+        self.permissions = compiled.permissions
+        self.is_admin = compiled.is_admin
+        self.is_leader = compiled.is_leader or user.post == '店长'
+        self.user_id = user.id
+        self.dept_id = user.dept_id
+        if compiled.declared_scope:
+            self.scope = compiled.declared_scope
+        elif self.is_admin:
+            self.scope = SCOPE_ALL
+        elif user.post == '导购':
+            self.scope = SCOPE_SELF
+        else:
+            self.scope = SCOPE_DEPT
+
+    def has(self, permission: str) -> bool:
+        return self.is_admin or permission in self.permissions
+
+    def can_transfer(self) -> bool:
+        return self.is_admin or self.is_leader or 'customer:transfer' in self.permissions
+
+    def apply_customer_scope(self, query):
+        """统一的客户数据范围过滤"""
+        if self.scope == SCOPE_ALL:
+            return query
+        # 与原逻辑一致: 未归属门店的账号不做门店过滤
+        if self.dept_id:
+            query = query.filter(CrmCustomer.dept_id == self.dept_id)
+        if self.scope == SCOPE_SELF:
+            query = query.filter(CrmCustomer.owner_id == self.user_id)
+        return query
@@ -76,5 +76,14 @@ export const PERMISSION_TREE = [
       { id: 'allocation:edit', label: '修改规则' },
       { id: 'allocation:delete', label: '删除规则' }
     ]
+  },
+  {
+    id: 'scope',
+    label: '客户数据范围',
+    children: [
+      { id: 'scope:all', label: '全部客户' },
+      { id: 'scope:dept', label: '本门店客户' },
+      { id: 'scope:self', label: '本人客户' }
+    ]
   }
 ]
\ No newline at end of file
@@ -0,0 +1,122 @@
+# backend/app/core/principal.py
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from jose import jwt, JWTError
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import SysUser, SysRole, SysDept
+from app.core.security import SECRET_KEY, ALGORITHM
+from app.core.ref_cache import ref_cache, RefRow
+from app.core.permission import AccessPolicy, compile_role
+
+# 配置: 登录态缓存有效期(秒) 与最大条目数
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
+class Principal:
+    """当前登录人: 用户快照、角色快照与编译后的权限 / 数据范围"""
+    def __init__(self, user: RefRow, role: Optional[RefRow], role_version: int):
+        self.user = user
+        self.role = role
+        self.dept_id = user.dept_id
+        self.policy = AccessPolicy(compile_role(role, role_version), user)
+
+class PrincipalCache:
+    """
+    按 token 缓存登录态，命中时跳过 JWT 解码与数据库查询
+    条目记录构建时 用户/角色/门店 的缓存版本号；update_user、toggle_status、reset_password、
+    角色修改等写操作会使 ref_cache 版本号变化，对应条目随之失效。
+    """
+    def __init__(self, ttl: int = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # token 摘要 -> (版本号元组, 过期时间, Principal)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def current_versions() -> tuple:
+        return ref_cache.version(SysUser), ref_cache.version(SysRole), ref_cache.version(SysDept)
+
+    def get(self, key: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                versions, expire_at, principal = entry
+                if versions == self.current_versions() and expire_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return principal
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, versions: tuple, expire_at: float, principal: Principal) -> None:
+        with self._lock:
+            self._entries[key] = (versions, min(expire_at, time.time() + self.ttl), principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 2) if total else 0
+            }
+
+# 全局单例
+principal_cache = PrincipalCache()
+
+# --- 依赖: 获取当前登录人 ---
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    versions = PrincipalCache.current_versions()
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username: str = payload.get("sub")
+        if username is None:
+            raise HTTPException(status_code=401, detail="无效凭证")
+    except JWTError:
+        raise HTTPException(status_code=401, detail="无效凭证")
+
+    # 走基础资料缓存，返回的是用户快照 (不含密码)
+    user = ref_cache.get_user_by_username(db, username)
+    if user is None:
+        raise HTTPException(status_code=401, detail="用户不存在")
+    if user.status != 1:
+        raise HTTPException(status_code=401, detail="该账号已被禁用")
+
+    principal = Principal(user, ref_cache.get(db, SysRole, user.role_id), versions[1])
+    principal_cache.put(key, versions, payload.get("exp") or time.time(), principal)
+    return principal
+
+def get_current_user(principal: Principal = Depends(get_current_principal)) -> RefRow:
+    return principal.user
+
+def get_admin_principal(principal: Principal = Depends(get_current_principal)) -> Principal:
+    """仅管理员可访问的接口 (运维、诊断类)"""
+    if not principal.policy.is_admin:
+        raise HTTPException(status_code=403, detail="权限不足：仅管理员可操作")
+    return principal
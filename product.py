@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
+from app.services.import_jobs import import_jobs
+from app.core.ref_cache import ref_cache
 from app.models import CrmProduct
 from app.schemas import ProductCreate, ProductUpdate, ProductResponse
 
@@ -28,6 +30,7 @@ def create_product(item: ProductCreate, db: Session = Depends(get_db)):
     )
     db.add(db_item)
     db.commit()
+    ref_cache.invalidate(CrmProduct)
     db.refresh(db_item)
     return db_item
 
@@ -42,6 +45,7 @@ def update_product(id: int, item: ProductUpdate, db: Session = Depends(get_db)):
     db_item.status = item.status
     
     db.commit()
+    ref_cache.invalidate(CrmProduct)
     db.refresh(db_item)
     return db_item
 
@@ -52,6 +56,7 @@ def delete_product(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="商品不存在")
     db.delete(db_item)
     db.commit()
+    ref_cache.invalidate(CrmProduct)
     return {"msg": "删除成功"}
 
 @router.put("/{id}/status")
@@ -61,4 +66,11 @@ def toggle_status(id: int, status: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="商品不存在")
     db_item.status = status
     db.commit()
-    return {"msg": "状态更新成功"}
\ No newline at end of file
+    ref_cache.invalidate(CrmProduct)
+    return {"msg": "状态更新成功"}
+
+# --- 导入商品 (后台任务，返回任务 ID 供轮询进度) ---
+@router.post("/import")
+def import_products(file: UploadFile = File(...)):
+    job = import_jobs.submit("product", file)
+    return {"job_id": job.id, "status": job.status}
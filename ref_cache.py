@@ -0,0 +1,150 @@
+# backend/app/core/ref_cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Dict, Iterable, Optional
+from sqlalchemy.orm import Session
+from app.models import SysDept, SysUser, SysRole, CrmProduct
+
+# 配置: 缓存有效期(秒) 与最大条目数
+REF_CACHE_TTL = int(os.getenv("REF_CACHE_TTL", "300"))
+REF_CACHE_MAX_ENTRIES = int(os.getenv("REF_CACHE_MAX_ENTRIES", "20000"))
+
+# 允许缓存的基础资料表
+CACHED_MODELS = (SysDept, SysUser, SysRole, CrmProduct)
+
+# 不进入缓存的敏感字段
+EXCLUDED_FIELDS = {"password"}
+
+class RefRow(SimpleNamespace):
+    """基础资料的只读快照 (脱离 Session，可跨请求复用)"""
+    pass
+
+def _snapshot(row) -> RefRow:
+    return RefRow(**{
+        c.key: getattr(row, c.key)
+        for c in row.__table__.columns
+        if c.key not in EXCLUDED_FIELDS
+    })
+
+class RefDataCache:
+    """
+    门店 / 员工 / 角色 / 商品 的进程内缓存
+    - 每张表有一个版本号，写操作调用 invalidate() 使版本号 +1，旧条目立即失效
+    - 每个条目带 TTL，多 worker 部署时其它进程的修改最迟在 TTL 后可见
+    - 总条目数受 LRU 上限约束
+    """
+    def __init__(self, ttl: int = REF_CACHE_TTL, max_entries: int = REF_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        # (表名, 键) -> (版本号, 过期时间, RefRow 或 None)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {m.__tablename__: 0 for m in CACHED_MODELS}
+        self._stats: Dict[str, Dict[str, int]] = {
+            m.__tablename__: {"hits": 0, "misses": 0, "invalidations": 0} for m in CACHED_MODELS
+        }
+
+    # --- 内部方法 ---
+    def _lookup(self, key: tuple):
+        """返回 (是否命中, 值)"""
+        table = key[0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                version, expire_at, value = entry
+                if version == self._versions[table] and expire_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats[table]["hits"] += 1
+                    return True, value
+                del self._entries[key]
+            self._stats[table]["misses"] += 1
+            return False, None
+
+    def _store(self, key: tuple, version: int, value) -> None:
+        with self._lock:
+            # 加载期间发生过失效，则丢弃这次结果
+            if version != self._versions[key[0]]:
+                return
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, model) -> int:
+        with self._lock:
+            return self._versions[model.__tablename__]
+
+    # --- 查询接口 ---
+    def get(self, db: Session, model, id: Optional[int]) -> Optional[RefRow]:
+        if not id:
+            return None
+        return self.get_many(db, model, [id]).get(id)
+
+    def get_many(self, db: Session, model, ids: Iterable[Optional[int]]) -> Dict[int, RefRow]:
+        """批量获取，未命中的 ID 用一条 IN 查询补齐"""
+        table = model.__tablename__
+        result: Dict[int, RefRow] = {}
+        missing = set()
+        for id in {i for i in ids if i}:
+            hit, value = self._lookup((table, "id", id))
+            if hit:
+                if value is not None:
+                    result[id] = value
+            else:
+                missing.add(id)
+        if missing:
+            version = self.version(model)
+            rows = db.query(model).filter(model.id.in_(missing)).all()
+            for row in rows:
+                snap = _snapshot(row)
+                result[row.id] = snap
+                self._store((table, "id", row.id), version, snap)
+            # 不存在的 ID 同样缓存，避免反复穿透
+            for id in missing - {row.id for row in rows}:
+                self._store((table, "id", id), version, None)
+        return result
+
+    def get_user_by_username(self, db: Session, username: str) -> Optional[RefRow]:
+        table = SysUser.__tablename__
+        hit, value = self._lookup((table, "username", username))
+        if hit:
+            return value
+        version = self.version(SysUser)
+        row = db.query(SysUser).filter(SysUser.username == username).first()
+        snap = _snapshot(row) if row else None
+        self._store((table, "username", username), version, snap)
+        if snap:
+            self._store((table, "id", snap.id), version, snap)
+        return snap
+
+    # --- 写操作后调用 ---
+    def invalidate(self, model) -> None:
+        table = model.__tablename__
+        with self._lock:
+            self._versions[table] += 1
+            self._stats[table]["invalidations"] += 1
+            for key in [k for k in self._entries if k[0] == table]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            tables = {}
+            for table, s in self._stats.items():
+                total = s["hits"] + s["misses"]
+                tables[table] = {
+                    **s,
+                    "version": self._versions[table],
+                    "hit_rate": round(s["hits"] / total * 100, 2) if total else 0
+                }
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "tables": tables
+            }
+
+# 全局单例
+ref_cache = RefDataCache()
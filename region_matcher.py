@@ -0,0 +1,124 @@
+# backend/app/services/region_matcher.py
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.models import SysRegionAllocation
+
+# 规则索引的最长存活时间(秒)，多 worker 部署时用于感知其它进程对规则的修改
+REGION_MATCHER_TTL = int(os.getenv("REGION_MATCHER_TTL", "300"))
+
+class AhoCorasick:
+    """多模式串匹配自动机: 一次扫描文本，找出出现过的全部关键字"""
+    def __init__(self, keywords):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[str]] = [set()]
+        for kw in keywords:
+            self._add(kw)
+        self._build()
+
+    def _add(self, kw: str) -> None:
+        node = 0
+        for ch in kw:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+            node = nxt
+        self._out[node].add(kw)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found |= self._out[node]
+        return found
+
+class RegionMatcher:
+    """
+    编译后的分配规则索引
+    规则按 create_time 倒序编号 (越新优先级越高)，与原逐条匹配的优先级一致:
+    1. 天淘省 命中，且未配置天淘市或天淘市也命中
+    2. 抖音省 命中，且未配置抖音市或抖音市也命中
+    3. 抖音省+市 组合字段命中
+    """
+    def __init__(self, rules: List[SysRegionAllocation]):
+        # (省/组合关键字, 需同时命中的市或 None)
+        self._conditions: List[List[Tuple[str, Optional[str]]]] = []
+        self._targets: List[Tuple[int, Optional[int]]] = []
+        # 触发关键字 -> 规则序号列表
+        self._trigger_index: Dict[str, List[int]] = {}
+        keywords: Set[str] = set()
+
+        for rank, rule in enumerate(rules):
+            conds = []
+            if rule.tiantao_province:
+                conds.append((rule.tiantao_province, rule.tiantao_city or None))
+            if rule.douyin_province:
+                conds.append((rule.douyin_province, rule.douyin_city or None))
+            if rule.douyin_province_city:
+                conds.append((rule.douyin_province_city, None))
+            self._conditions.append(conds)
+            self._targets.append((rule.target_dept_id, rule.target_leader_id))
+            for trigger, city in conds:
+                self._trigger_index.setdefault(trigger, []).append(rank)
+                keywords.add(trigger)
+                if city:
+                    keywords.add(city)
+
+        self._automaton = AhoCorasick(keywords)
+        self.rule_count = len(rules)
+        self.built_at = time.monotonic()
+
+    def match(self, address: str) -> Tuple[Optional[int], Optional[int]]:
+        if not address:
+            return None, None
+        found = self._automaton.find_all(address)
+        candidates = sorted({r for kw in found for r in self._trigger_index.get(kw, ())})
+        for rank in candidates:
+            for trigger, city in self._conditions[rank]:
+                if trigger in found and (not city or city in found):
+                    return self._targets[rank]
+        return None, None
+
+# --- 全局索引: 规则变更时调用 invalidate_region_matcher() 触发重建 ---
+_lock = threading.Lock()
+_matcher: Optional[RegionMatcher] = None
+
+def get_region_matcher(db: Session) -> RegionMatcher:
+    global _matcher
+    with _lock:
+        m = _matcher
+        if m is None or time.monotonic() - m.built_at > REGION_MATCHER_TTL:
+            rules = db.query(SysRegionAllocation).order_by(
+                SysRegionAllocation.create_time.desc(), SysRegionAllocation.id.desc()
+            ).all()
+            m = _matcher = RegionMatcher(rules)
+        return m
+
+def invalidate_region_matcher() -> None:
+    global _matcher
+    with _lock:
+        _matcher = None
@@ -1,27 +1,30 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from sqlalchemy import func
 from app.database import get_db
-from app.models import CrmCustomer, CrmFollowRecord, SysOperationLog, SysUser
+from app.models import CrmCustomer, CrmFollowRecord, SysOperationLog, RptDailyStat
+from app.services.stats_service import rebuild_daily_stats
+from app.core.name_resolver import NameResolver
+from app.core.principal import Principal, get_admin_principal
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date, timedelta
 
 router = APIRouter()
 
-# --- 1. 客资来源转化统计 ---
+# --- 1. 客资来源转化统计 (读取每日汇总表) ---
 @router.get("/source_stats")
 def get_source_stats(db: Session = Depends(get_db)):
     # 聚合查询：按 source 分组，统计总数和成交数
     stats = db.query(
-        CrmCustomer.source,
-        func.count(CrmCustomer.id).label('total'),
-        func.sum(case((CrmCustomer.is_deal == 1, 1), else_=0)).label('deal_count')
-    ).group_by(CrmCustomer.source).all()
+        RptDailyStat.source,
+        func.sum(RptDailyStat.new_count).label('total'),
+        func.sum(RptDailyStat.deal_count).label('deal_count')
+    ).group_by(RptDailyStat.source).all()
     
     result = []
     for s in stats:
-        total = s.total or 0
-        deal = s.deal_count or 0
+        total = int(s.total or 0)
+        deal = int(s.deal_count or 0)
         rate = 0
         if total > 0:
             rate = round((deal / total * 100), 2)
@@ -34,33 +37,58 @@ def get_source_stats(db: Session = Depends(get_db)):
         })
     return result
 
-# --- 2. 客资跟进效率明细 (最近 50 条) ---
+# --- 2. 客资跟进效率明细 (支持时间范围、门店、跟进人筛选与分页) ---
 @router.get("/efficiency")
-def get_follow_efficiency(db: Session = Depends(get_db)):
-    # 查询最近的 50 个客户
-    customers = db.query(CrmCustomer).order_by(CrmCustomer.create_time.desc()).limit(50).all()
+def get_follow_efficiency(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    dept_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    # 1. 按条件取一页客户 (按进线时间倒序)
+    query = db.query(CrmCustomer)
+    if start_date:
+        query = query.filter(CrmCustomer.create_time >= start_date)
+    if end_date:
+        query = query.filter(CrmCustomer.create_time < end_date + timedelta(days=1))
+    if dept_id:
+        query = query.filter(CrmCustomer.dept_id == dept_id)
+    if owner_id:
+        query = query.filter(CrmCustomer.owner_id == owner_id)
+    customers = query.order_by(CrmCustomer.create_time.desc(), CrmCustomer.id.desc()) \
+        .offset((page - 1) * page_size).limit(page_size).all()
+    if not customers:
+        return []
+    ids = [c.id for c in customers]
+    
+    # 2. 分配时间: 每个客户最后一次“转移客户”的时间 (分组 MAX)
+    assign_times = dict(db.query(
+        SysOperationLog.ref_id, func.max(SysOperationLog.create_time)
+    ).filter(
+        SysOperationLog.ref_id.in_(ids),
+        SysOperationLog.action_type == '转移客户'
+    ).group_by(SysOperationLog.ref_id).all())
+    
+    # 3. 首次跟进: 每个客户最早一条跟进记录的时间 (分组 MIN)
+    first_follows = dict(db.query(
+        CrmFollowRecord.customer_id, func.min(CrmFollowRecord.create_time)
+    ).filter(
+        CrmFollowRecord.customer_id.in_(ids)
+    ).group_by(CrmFollowRecord.customer_id).all())
+    
+    # 4. 跟进人名称批量解析
+    resolver = NameResolver(db).prefetch(user=[c.owner_id for c in customers])
     
     result = []
     for c in customers:
-        # 1. 进线时间 (创建时间)
+        # 进线时间 (创建时间)
         t1 = c.create_time
-        
-        # 2. 分配时间 (查询日志中最后一次“转移客户”的操作时间)
-        log = db.query(SysOperationLog).filter(
-            SysOperationLog.ref_id == c.id,
-            SysOperationLog.action_type == '转移客户'
-        ).order_by(SysOperationLog.create_time.desc()).first()
-        
-        # 优化逻辑：如果有转移记录，用转移时间；如果没有(说明是自动分配或直接录入)，用创建时间作为分配时间
-        t2 = log.create_time if log else t1
-        
-        # 3. 首次跟进 (查询跟进记录表中最早的一条)
-        first_follow = db.query(CrmFollowRecord).filter(
-            CrmFollowRecord.customer_id == c.id
-        ).order_by(CrmFollowRecord.create_time.asc()).first()
-        t3 = first_follow.create_time if first_follow else None
-        
-        # 4. 成交时间
+        # 如果有转移记录，用转移时间；如果没有(说明是自动分配或直接录入)，用创建时间作为分配时间
+        t2 = assign_times.get(c.id) or t1
+        t3 = first_follows.get(c.id)
         t4 = c.deal_time
         
         # 计算响应时效 (首次跟进 - 分配时间)
@@ -71,14 +99,9 @@ def get_follow_efficiency(db: Session = Depends(get_db)):
             seconds = max(0, diff.total_seconds())
             response_hours = round(seconds / 3600, 1)
 
-        owner_name = "未知"
-        if c.owner_id:
-            u = db.query(SysUser).filter(SysUser.id == c.owner_id).first()
-            if u: owner_name = u.username
-
         result.append({
             "customer_name": c.customer_name,
-            "owner_name": owner_name,
+            "owner_name": resolver.name("user", c.owner_id) or "未知",
             "time_enter": t1,          # 进线
             "time_assign": t2,         # 分配 (优化后)
             "time_first_follow": t3,   # 跟进
@@ -88,13 +111,18 @@ def get_follow_efficiency(db: Session = Depends(get_db)):
         
     return result
 
-# --- 3. 首页顶部汇总数据 ---
+# --- 3. 首页顶部汇总数据 (读取每日汇总表) ---
 @router.get("/summary")
 def get_summary(db: Session = Depends(get_db)):
-    total_customer = db.query(CrmCustomer).count()
-    total_deal = db.query(CrmCustomer).filter(CrmCustomer.is_deal == 1).count()
+    total_customer, total_deal = db.query(
+        func.coalesce(func.sum(RptDailyStat.new_count), 0),
+        func.coalesce(func.sum(RptDailyStat.deal_count), 0)
+    ).one()
+    total_customer, total_deal = int(total_customer), int(total_deal)
     # 注意：这里依赖服务器时区，Docker 默认为 UTC。如果发现“今日新增”不准，需调整容器时区。
-    today_new = db.query(CrmCustomer).filter(func.date(CrmCustomer.create_time) == datetime.now().date()).count()
+    today_new = int(db.query(func.coalesce(func.sum(RptDailyStat.new_count), 0)).filter(
+        RptDailyStat.stat_date == datetime.now().date()
+    ).scalar())
     
     rate = 0
     if total_customer > 0:
@@ -105,4 +133,13 @@ def get_summary(db: Session = Depends(get_db)):
         "total_deal": total_deal,
         "today_new": today_new,
         "conversion_rate": rate
-    }
\ No newline at end of file
+    }
+
+# --- 4. 重建每日汇总表 (全量回填，数据校正用) ---
+@router.post("/rebuild_stats")
+def rebuild_stats(
+    principal: Principal = Depends(get_admin_principal),
+    db: Session = Depends(get_db)
+):
+    rows = rebuild_daily_stats(db)
+    return {"msg": f"统计重建完成，共 {rows} 行"}
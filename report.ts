@@ -17,9 +17,11 @@ export const getSourceStats = () => {
 }
 
 // 获取跟进效率报表 (生命周期表)
-export const getFollowEfficiency = () => {
+// params: { start_date, end_date, dept_id, owner_id, page, page_size }
+export const getFollowEfficiency = (params?: any) => {
   return request({
     url: '/report/efficiency',
-    method: 'get'
+    method: 'get',
+    params
   })
 }
\ No newline at end of file
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 from app.database import get_db
+from app.core.ref_cache import ref_cache
 from app.models import SysRole
 from app.schemas import RoleCreate, RoleUpdate, RoleResponse
 
@@ -39,6 +40,7 @@ def create_role(role: RoleCreate, db: Session = Depends(get_db)):
     )
     db.add(db_role)
     db.commit()
+    ref_cache.invalidate(SysRole)
     db.refresh(db_role)
     return db_role
 
@@ -56,6 +58,7 @@ def update_role(role_id: int, role: RoleUpdate, db: Session = Depends(get_db)):
         db_role.status = role.status
         
     db.commit()
+    ref_cache.invalidate(SysRole)
     db.refresh(db_role)
     return db_role
 
@@ -67,6 +70,7 @@ def delete_role(role_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_role)
     db.commit()
+    ref_cache.invalidate(SysRole)
     return {"msg": "删除成功"}
 
 # --- 新增：状态切换接口 ---
@@ -78,4 +82,5 @@ def toggle_role_status(role_id: int, status: int, db: Session = Depends(get_db))
     
     db_role.status = status
     db.commit()
+    ref_cache.invalidate(SysRole)
     return {"msg": "状态更新成功"}
\ No newline at end of file
@@ -122,6 +122,12 @@ class CustomerResponse(CustomerBase):
     intent_product_name: Optional[str] = None
     class Config: from_attributes = True
 
+class CustomerPage(BaseModel):
+    items: List[CustomerResponse]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
+    total: Optional[int] = None
+
 class CustomerTransfer(BaseModel):
     customer_ids: List[int]
     new_owner_id: int
@@ -174,6 +180,9 @@ class OrderResponse(OrderBase):
     create_time: datetime
     product_name: Optional[str] = None
     maker_name: Optional[str] = None
+    # 订单照片缩略图 (列表用) 与预览图 (详情用)，与 order_image_url 一一对应
+    order_image_thumb_url: Optional[str] = None
+    order_image_preview_url: Optional[str] = None
     class Config: from_attributes = True
 
 # --- 9. 跟进记录 ---
@@ -198,9 +207,36 @@ class LogResponse(BaseModel):
     create_time: datetime
     class Config: from_attributes = True
 
+# --- 10.1 客户详情 (含最近跟进、订单、日志) ---
+class CustomerDetail(CustomerResponse):
+    follows: List[FollowResponse] = []
+    orders: List[OrderResponse] = []
+    logs: List[LogResponse] = []
+
 # --- 11. AI ---
 class AIRequest(BaseModel):
     prompt: str
+    # 为 True 时以 SSE (text/event-stream) 增量返回
+    stream: bool = False
+
+# --- 11.1 批量话术: 选择 N 天未跟进的未成交客户 ---
+class AIBatchRequest(BaseModel):
+    stale_days: int = 7
+    include_never_followed: bool = True
+    dept_id: Optional[int] = None
+    follow_status: Optional[str] = None
+    limit: Optional[int] = None
+
+class AIScriptResponse(BaseModel):
+    id: int
+    customer_id: int
+    job_id: Optional[str] = None
+    content: Optional[str] = None
+    status: Optional[str] = None
+    error: Optional[str] = None
+    create_time: Optional[datetime] = None
+    customer_name: Optional[str] = None
+    class Config: from_attributes = True
 
 # --- 12. 通用 ---
 class ResponseModel(BaseModel):
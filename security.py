@@ -1,5 +1,9 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 from passlib.context import CryptContext
 from jose import jwt
 
@@ -19,6 +23,37 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# --- 批量密码哈希: pbkdf2 属于 CPU 密集计算，放到进程池中并行 ---
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "0")) or (os.cpu_count() or 1)
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # 使用 spawn，避免在多线程进程中 fork
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _hash_pool
+
+def shutdown_hash_pool() -> None:
+    """关闭进程池 (应用退出时调用)，之后再调用 hash_passwords 会重新创建"""
+    global _hash_pool
+    with _hash_pool_lock:
+        pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """批量计算密码哈希，结果顺序与输入一致"""
+    if len(passwords) <= 1 or HASH_WORKERS <= 1:
+        return [get_password_hash(p) for p in passwords]
+    chunksize = max(1, len(passwords) // (HASH_WORKERS * 4))
+    return list(_get_hash_pool().map(get_password_hash, passwords, chunksize=chunksize))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
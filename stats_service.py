@@ -0,0 +1,114 @@
+# backend/app/services/stats_service.py
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+from app.models import CrmCustomer, CrmFollowRecord, RptDailyStat
+
+# 单条 INSERT 的最大行数
+STAT_BATCH_SIZE = 1000
+
+# (日期, 门店ID, 来源, 新增数, 成交数, 跟进数)
+StatItem = Tuple[date, Optional[int], Optional[str], int, int, int]
+
+def _key(day: date, dept_id: Optional[int], source: Optional[str]):
+    return day, dept_id or 0, (source or '')[:50]
+
+def bump_daily_stats(db: Session, items: Iterable[StatItem]) -> None:
+    """
+    累加每日统计 (INSERT ... ON DUPLICATE KEY UPDATE，并发安全)
+    只加入调用方的事务，不提交
+    """
+    merged = defaultdict(lambda: [0, 0, 0])
+    for day, dept_id, source, new, deal, follow in items:
+        counts = merged[_key(day, dept_id, source)]
+        counts[0] += new
+        counts[1] += deal
+        counts[2] += follow
+    rows = [
+        {"stat_date": k[0], "dept_id": k[1], "source": k[2], "new_count": v[0], "deal_count": v[1], "follow_count": v[2]}
+        for k, v in merged.items() if any(v)
+    ]
+    table = RptDailyStat.__table__
+    for start in range(0, len(rows), STAT_BATCH_SIZE):
+        stmt = mysql_insert(table).values(rows[start:start + STAT_BATCH_SIZE])
+        stmt = stmt.on_duplicate_key_update(
+            new_count=table.c.new_count + stmt.inserted.new_count,
+            deal_count=table.c.deal_count + stmt.inserted.deal_count,
+            follow_count=table.c.follow_count + stmt.inserted.follow_count,
+        )
+        db.execute(stmt)
+
+def bump_daily_stat(db: Session, dept_id: Optional[int], source: Optional[str], new: int = 0, deal: int = 0, follow: int = 0, day: Optional[date] = None) -> None:
+    bump_daily_stats(db, [(day or datetime.now().date(), dept_id, source, new, deal, follow)])
+
+def _collect_stat_items(db: Session, customer_ids: Optional[List[int]] = None) -> List[StatItem]:
+    """
+    按业务表统计 (日期, 门店, 来源) 的新增 / 成交 / 跟进数
+    :param customer_ids: 只统计这些客户；为 None 时统计全部
+    """
+    def scoped(query):
+        return query.filter(CrmCustomer.id.in_(customer_ids)) if customer_ids is not None else query
+
+    items = []
+    # 1. 新增客资: 按进线日期
+    day = func.date(CrmCustomer.create_time)
+    for d, dept_id, source, cnt in scoped(db.query(day, CrmCustomer.dept_id, CrmCustomer.source, func.count(CrmCustomer.id))) \
+            .filter(CrmCustomer.create_time.isnot(None)).group_by(day, CrmCustomer.dept_id, CrmCustomer.source):
+        items.append((d, dept_id, source, cnt, 0, 0))
+    # 2. 成交客户: 按成交日期，缺失时按进线日期
+    day = func.date(func.coalesce(CrmCustomer.deal_time, CrmCustomer.create_time))
+    for d, dept_id, source, cnt in scoped(db.query(day, CrmCustomer.dept_id, CrmCustomer.source, func.count(CrmCustomer.id))) \
+            .filter(CrmCustomer.is_deal == 1).group_by(day, CrmCustomer.dept_id, CrmCustomer.source):
+        if d:
+            items.append((d, dept_id, source, 0, cnt, 0))
+    # 3. 跟进次数: 按跟进日期，归属客户当前的门店与来源
+    day = func.date(CrmFollowRecord.create_time)
+    for d, dept_id, source, cnt in scoped(db.query(day, CrmCustomer.dept_id, CrmCustomer.source, func.count(CrmFollowRecord.id))) \
+            .join(CrmCustomer, CrmCustomer.id == CrmFollowRecord.customer_id) \
+            .filter(CrmFollowRecord.create_time.isnot(None)).group_by(day, CrmCustomer.dept_id, CrmCustomer.source):
+        items.append((d, dept_id, source, 0, 0, cnt))
+    return items
+
+# move_customer_stats 中表示“该字段不变”
+UNCHANGED = object()
+
+def move_customer_stats(db: Session, customer_ids: List[int], dept_id=UNCHANGED, source=UNCHANGED) -> None:
+    """
+    客户改门店 / 来源时，把已计入的新增、成交、跟进数从旧的 (门店, 来源) 移到新的
+    须在 UPDATE 之前调用 (读取的是库中的旧值)；只加入调用方的事务，不提交
+    """
+    if not customer_ids:
+        return
+    moved = []
+    for day, old_dept, old_source, new, deal, follow in _collect_stat_items(db, customer_ids):
+        new_dept = old_dept if dept_id is UNCHANGED else dept_id
+        new_source = old_source if source is UNCHANGED else source
+        if _key(day, old_dept, old_source) == _key(day, new_dept, new_source):
+            continue
+        moved.append((day, old_dept, old_source, -new, -deal, -follow))
+        moved.append((day, new_dept, new_source, new, deal, follow))
+    bump_daily_stats(db, moved)
+
+def rebuild_daily_stats(db: Session) -> int:
+    """
+    从业务表全量回填每日统计 (清空后重建)
+    :return: 生成的汇总行数
+    """
+    items = _collect_stat_items(db)
+    db.query(RptDailyStat).delete(synchronize_session=False)
+    bump_daily_stats(db, items)
+    db.commit()
+    return db.query(RptDailyStat).count()
+
+# 命令行回填: python -m app.services.stats_service
+if __name__ == "__main__":
+    from app.database import SessionLocal, engine
+    RptDailyStat.__table__.create(bind=engine, checkfirst=True)
+    session = SessionLocal()
+    try:
+        print(f">>> [统计回填] 完成，共 {rebuild_daily_stats(session)} 行")
+    finally:
+        session.close()
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
-from app.models import SysUser, SysDept, SysRole
+from app.services.import_jobs import import_jobs
+from app.core.ref_cache import ref_cache
+from app.models import SysUser
 from app.schemas import UserCreate, UserUpdate, UserResponse, UserPasswordReset
 from app.core.security import get_password_hash
+from app.core.name_resolver import NameResolver
 
 router = APIRouter()
 
@@ -25,16 +28,16 @@ def get_users(
         
     users = query.all()
     
-    # 填充关联信息 (门店名、角色名)
+    # 填充关联信息 (门店名、角色名)，批量解析
+    resolver = NameResolver(db).prefetch(
+        dept=[u.dept_id for u in users],
+        role=[u.role_id for u in users]
+    )
     result = []
     for u in users:
         u_data = UserResponse.from_orm(u)
-        if u.dept_id:
-            dept = db.query(SysDept).filter(SysDept.id == u.dept_id).first()
-            if dept: u_data.dept_name = dept.dept_name
-        if u.role_id:
-            role = db.query(SysRole).filter(SysRole.id == u.role_id).first()
-            if role: u_data.role_name = role.role_name
+        u_data.dept_name = resolver.name("dept", u.dept_id)
+        u_data.role_name = resolver.name("role", u.role_id)
         result.append(u_data)
     return result
 
@@ -57,6 +60,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     db.add(db_user)
     db.commit()
+    ref_cache.invalidate(SysUser)
     db.refresh(db_user)
     return db_user
 
@@ -79,6 +83,7 @@ def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
         db_user.password = get_password_hash(user.password)
         
     db.commit()
+    ref_cache.invalidate(SysUser)
     db.refresh(db_user)
     return db_user
 
@@ -94,6 +99,7 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
         
     db.delete(db_user)
     db.commit()
+    ref_cache.invalidate(SysUser)
     return {"msg": "删除成功"}
 
 @router.put("/{user_id}/status")
@@ -110,6 +116,7 @@ def toggle_status(user_id: int, status: int, db: Session = Depends(get_db)):
         
     db_user.status = status
     db.commit()
+    ref_cache.invalidate(SysUser)
     return {"msg": "状态更新成功"}
 
 # --- 新增：重置密码接口 ---
@@ -126,5 +133,12 @@ def reset_password(user_id: int, item: UserPasswordReset, db: Session = Depends(
     # 强制更新密码
     db_user.password = get_password_hash(item.new_password)
     db.commit()
+    ref_cache.invalidate(SysUser)
     
-    return {"msg": "密码重置成功"}
\ No newline at end of file
+    return {"msg": "密码重置成功"}
+
+# --- 导入用户 (后台任务，返回任务 ID 供轮询进度) ---
+@router.post("/import")
+def import_users(file: UploadFile = File(...)):
+    job = import_jobs.submit("user", file)
+    return {"job_id": job.id, "status": job.status}